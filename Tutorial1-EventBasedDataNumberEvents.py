@@ -18,17 +18,16 @@ Key Concepts:
   a set number of events at a time for visualization.
 
 Steps:
-1. Load event data using the `importIitYarp` function from the Bimvee library.
+1. Load event data using the `importIitYarp` function from the Bimvee library, cached on disk after the first run.
 2. Define camera parameters (resolution, event count window).
 3. Process and visualize events in batches, updating the display dynamically.
 """
 
-# Import the function 'importIitYarp' from the 'bimvee' library to load event-based camera data
-from bimvee.importIitYarp import importIitYarp
-
 # Import necessary libraries for plotting and numerical operations
 import matplotlib
 from helpers.helpers import number_events  # Import function to process a fixed number of events
+# Import the function that loads event-based camera data with 'importIitYarp' from 'bimvee' and caches it on disk
+from helpers.helpers import load_yarp_events
 
 # Set the backend for Matplotlib to 'TkAgg' to enable interactive plotting
 matplotlib.use('TkAgg')
@@ -46,9 +45,10 @@ codec = '24bit'
 # Set the file path where the event data is stored
 filePathOrName = 'data/attention-multiobjects/'
 
-# Load the event data using the 'importIitYarp' function
-events = importIitYarp(
-    filePathOrName=filePathOrName,  # Path to the dataset
+# Load the event data, decoded with 'importIitYarp' on the first run and memory-mapped from the cache afterwards
+events = load_yarp_events(
+    filePathOrName,  # Path to the dataset
+    camera_events,  # Camera from which events are extracted
     codec=codec  # Codec to decode the event data
 )
 
@@ -56,4 +56,6 @@ events = importIitYarp(
 num_events = 1000
 
 # Process and visualize events in batches of 'num_events'
+# Frames are shown on screen by default, pass sink=NullSink() (from helpers.helpers) to run headless
+# or sink=VideoSink('events.mp4') to record them
 number_events(events, camera_events, height, width, num_events)
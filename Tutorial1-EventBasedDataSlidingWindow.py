@@ -15,16 +15,15 @@ Key Concepts:
   continuously updating over time to show the most recent activity.
 
 Steps:
-1. Load event data from the Bimvee library.
+1. Load event data from the Bimvee library (cached on disk after the first run).
 2. Initialize matrices for tracking positive and negative events.
 3. Process events within an initial time window.
 4. Apply a sliding window to continuously update the visualization.
 5. Display the processed events in real time using OpenCV.
 """
 
-from bimvee.importIitYarp import importIitYarp
 import matplotlib
-from helpers.helpers import sliding_window
+from helpers.helpers import sliding_window, load_yarp_events
 
 # Set the backend for Matplotlib to 'TkAgg' to enable interactive plotting
 matplotlib.use('TkAgg')
@@ -40,6 +39,8 @@ time_buff = sliding_wdw # Buffer for managing event updates
 camera_events = 'right'  # Specify the camera side ('left' or 'right')
 codec = '24bit'  # Codec format for event data
 filePathOrName = 'data/attention-multiobjects/'  # Path to event dataset
-events = importIitYarp(filePathOrName=filePathOrName, codec=codec)
+events = load_yarp_events(filePathOrName, camera_events, codec=codec)  # Cached after the first decoding
 
+# Frames are shown on screen by default, pass sink=NullSink() (from helpers.helpers) to run headless
+# or sink=VideoSink('events.mp4') to record them
 sliding_window(events, camera_events, height, width, initial_window_period, sliding_wdw, time_buff)
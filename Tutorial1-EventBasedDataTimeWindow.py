@@ -12,12 +12,10 @@ polarities of the events. Finally, we will visualize the events in an interactiv
 displaying them in real-time within specified time windows.
 '''
 
-# Import the function 'importIitYarp' from the 'bimvee' library to load event-based camera data
-from bimvee.importIitYarp import importIitYarp
-
 # Import necessary libraries for plotting and numerical operations
 import matplotlib
-from helpers.helpers import time_window
+# 'load_yarp_events' decodes the data once with 'importIitYarp' from the 'bimvee' library and caches it on disk
+from helpers.helpers import time_window, load_yarp_events
 
 # Set the backend for Matplotlib to 'TkAgg' to enable interactive plotting
 matplotlib.use('TkAgg')
@@ -33,9 +31,12 @@ camera_events = 'right'
 codec = '24bit'
 # Set the file path where the event data is stored
 filePathOrName = 'data/attention-multiobjects/'
-# Load the event data using the 'importIitYarp' function
-events = importIitYarp(
-    filePathOrName=filePathOrName,  # Path to the dataset
+# Load the event data, decoded with 'importIitYarp' on the first run and memory-mapped from the cache afterwards
+events = load_yarp_events(
+    filePathOrName,  # Path to the dataset
+    camera_events,  # Camera from which events are extracted
     codec=codec)  # Codec to decode the event data
 
+# Frames are shown on screen by default, pass sink=NullSink() (from helpers.helpers) to run headless
+# or sink=VideoSink('events.mp4') to record them
 time_window(events, camera_events,height, width,window_period)
@@ -1,6 +1,7 @@
 import tonic
 import cv2
 import numpy as np
+from helpers.datasets import CachedFrameDataset
 
 '''
 Giulia D'Angelo, giulia.dangelo@fel.cvut.cz
@@ -25,15 +26,17 @@ dvs_training = tonic.datasets.DVSGesture(path, train=True)
 time_window = 10000  # Time window in microseconds (10 ms)
 user_trial = 1      # Index of the user trial to analyze
 
-# Load events and corresponding numpy data for the specified trial
-events, npys = dvs_training[user_trial]
-
-# Transform events into frames using the specified time window
-transform = tonic.transforms.ToFrame(
-    sensor_size=dvs_training.sensor_size,
-    time_window=time_window  # Convert events to frames based on the time window
+# Transform the events of every trial into frames using the specified time window. The trials are binned once,
+# in parallel, and cached on disk (in data/DVSGesture/frames_train/<sensor size>_<time window>us), so later runs
+# and DataLoader epochs only read the frames back
+dvs_frames = CachedFrameDataset(
+    dvs_training,
+    time_window=time_window,  # Convert events to frames based on the time window
+    sensor_size=dvs_training.sensor_size
 )
-frames = transform(events)  # Generate frames from events
+
+# Load the frames and corresponding label for the specified trial
+frames, target = dvs_frames[user_trial]
 
 # Output the number of frames generated
 print(f"Number of frames: {len(frames)}")
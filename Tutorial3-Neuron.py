@@ -12,6 +12,7 @@ import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
 import matplotlib
+from helpers.neurons import simulate_lif_population  # Vectorized integrator of a population of LIF neurons
 
 # Set the backend for Matplotlib to 'TkAgg' for interactive plotting
 matplotlib.use('TkAgg')
@@ -37,21 +38,17 @@ pulse_times = np.arange(20, T, 40)  # Define pulse start times
 for t in pulse_times:
     I_ext[int(t/dt):int((t+10)/dt)] = 2.0  # Create short pulses of current
 
-# Initialize membrane potential
-V = np.zeros_like(time)  # Membrane potential array
-V[0] = VL  # Set initial potential to resting potential
-
-# Simulate LIF neuron dynamics
-for i in range(1, len(time)):
-    # Calculate change in membrane potential (dV/dt) based on leak and input current
-    dVdt = ((VL - V[i-1]) + Rm * I_ext[i]) / tau_m
-    V[i] = V[i-1] + dVdt * dt  # Update membrane potential using Euler's method
-
-    # Check if the potential exceeds the threshold to generate a spike
-    if V[i] >= VT:
-        V[i] = VT + 5  # Simulate spike peak by temporarily exceeding threshold
-        if i + 1 < len(time):
-            V[i + 1] = VR  # Reset potential after spike
+# Simulate LIF neuron dynamics: the neuron is a population of one, integrated with Euler's method. The membrane
+# potential shows the spike peak when it exceeds the threshold, then is reset to VR for the refractory period
+spike_ids, spike_times, V = simulate_lif_population(I_ext, dt, Cm, gL, VL, VT, VR, t_ref=dt, method='euler', record=True)
+V = V[:, 0]  # Membrane potential array
+print('Spike times (ms): ', spike_times)
+
+# The same integrator sweeps parameters in one run: here 1000 input amplitudes between 0 and 4 uA, one per neuron
+amplitudes = np.linspace(0, 4, 1000)
+sweep_ids, sweep_times = simulate_lif_population(I_ext[:, np.newaxis] / 2.0 * amplitudes, dt, Cm, gL, VL, VT, VR, t_ref=2.0)
+spike_counts = np.bincount(sweep_ids, minlength=len(amplitudes))
+print('Minimum amplitude producing spikes (uA): ', amplitudes[np.argmax(spike_counts > 0)])
 
 # Create animation of the simulation
 fig, ax = plt.subplots(2, 1, figsize=(16, 10), sharex=True)
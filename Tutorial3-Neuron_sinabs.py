@@ -2,12 +2,12 @@
 Giulia D'Angelo, giulia.dangelo@fel.cvut.cz
 
 This script creates a single neuron and injects it with current to see the membrane potential dynamics.
-From sinabs documentation.
+From sinabs documentation, with the sinabs LIF dynamics simulated by an event-driven population of neurons.
 '''
 
 import os
 import torch
-import sinabs.layers as sl
+from helpers.neurons import EventDrivenLIF
 import matplotlib.pyplot as plt
 import numpy as np
 import matplotlib
@@ -24,12 +24,6 @@ x = np.zeros(lenstim).astype(int)
 y = np.zeros(lenstim).astype(int)
 p = np.zeros(lenstim).astype(int)
 
-# Define a class for Receptive Fields (RFs) with a Leaky Integrate-and-Fire (LIF) neuron
-class RFs:
-    def __init__(self, tau_mem):
-        self.neuron = sl.LIF(tau_mem=tau_mem)  # Initialize the LIF neuron with a given membrane time constant
-        self.vmem = []  # List to store membrane potential values
-
 # Define the dimensions of the neuron layer
 width = 2
 height = 2
@@ -38,26 +32,22 @@ num_neurons = width * height
 # Membrane time constant
 tau_mem = 1
 
-# Create a layer of RFs neurons
-neurons = [[RFs(tau_mem=tau_mem) for _ in range(width)] for _ in range(height)]
+# Create a layer of LIF neurons: all the membrane potentials live in one tensor and a neuron is only
+# updated when it receives an input, following the same dynamics as sinabs.layers.LIF
+neurons = EventDrivenLIF(num_neurons, tau_mem=tau_mem)
 
-# Output spike raster
-spike_train = []
+# Inject the current into the neurons selected by the x, y coordinates, one input per time step
+with torch.no_grad():  # Disable gradient calculation for efficiency
+    t = np.arange(0, lenstim - 1)
+    neuron_ids = y[t] * width + x[t]  # Select the neuron based on the current coordinates
+    spike_ids, spike_ts, spike_counts, vmem = neurons(neuron_ids, t, ts[0, t, 0], record=True)
 
-# Iterate over the time steps to simulate the neuron dynamics
-i = 0
-for t in range(0, lenstim-1):
-    with torch.no_grad():  # Disable gradient calculation for efficiency
-        RF = neurons[y[i]][x[i]]  # Select the neuron based on the current coordinates
-        out = RF.neuron(ts[:, i : i + 1])  # Inject current into the neuron and get the output spikes
-        if (out != 0).any():  # Check if there is a spike
-            spike_train.append(ts.unsqueeze(dim=0))  # Record the spike
-        RF.vmem.append(RF.neuron.v_mem[0, 0])  # Record the membrane potential
-    i += 1
+# Output spike raster
+spike_train = list(zip(spike_ids.tolist(), spike_ts.tolist()))
 
 # Plot the membrane potential dynamics of the first neuron
 plt.figure()
-plt.plot(range(lenstim-1), neurons[0][0].vmem)
+plt.plot(t[neuron_ids == 0], vmem[torch.from_numpy(neuron_ids == 0)])
 plt.title("LIF membrane dynamics")
 plt.xlabel("$t$ [ms]")
 plt.ylabel("$V_{mem}$")
@@ -14,6 +14,9 @@ and we will visualize the spiking activity and firing rates based on their basel
 # Import necessary libraries for simulating spiking neural networks and plotting
 from brian2 import *
 import matplotlib
+from helpers.brian import BrianSweep, DVSInput  # Parameter sweeps and replay of DVS recordings
+from helpers.helpers import EventStream
+import os
 
 # Set the backend for Matplotlib to 'TkAgg' to allow interactive plotting windows
 matplotlib.use('TkAgg')
@@ -73,6 +76,34 @@ xlabel('v0')  # Label the x-axis as "v0"
 ylabel('Firing rate (sp/s)')  # Label the y-axis as "Firing rate (spikes per second)"
 title('Firing Rate vs Baseline Potential')  # Add a title for clarity
 
+# Sweep: firing rate curves for several time constants. The network is built once and restored before every
+# configuration (set standalone_dir to a folder to compile it as C++ once and rerun the binary instead)
+sweep = BrianSweep(N, duration, standalone_dir=None)
+taus = [5 * ms, 10 * ms, 20 * ms]
+counts, spike_indptr, spike_i, spike_t = sweep.sweep(taus, [v0_max])
+figure(figsize=(6, 4))
+for k, tau_k in enumerate(taus):
+    plot(G.v0, counts[k, 0] / duration, label=f'tau = {tau_k}')  # Firing rate of every neuron for this tau
+xlabel('v0')
+ylabel('Firing rate (sp/s)')
+title('Firing Rate vs Baseline Potential for several tau')
+legend()
+
+# Drive the neurons with a real DVS recording (the one of Tutorial5, if downloaded): one input neuron per pixel and
+# polarity, replayed one chunk at a time so that long recordings never sit in memory as spike lists
+events_path = 'data/twoobjects/twoobjects.npy'
+if os.path.exists(events_path):
+    events = EventStream.from_npy(events_path)
+    dvs = DVSInput(events.resolution, dt=defaultclock.dt)
+    pixels = NeuronGroup(dvs.group.N, 'dv/dt = -v / tau : 1', threshold='v > 1', reset='v = 0', method='exact')
+    S = Synapses(dvs.group, pixels, on_pre='v += 0.5')  # Each event pushes its neuron towards the threshold
+    S.connect(j='i')
+    M_pixels = SpikeMonitor(pixels)
+    net = Network(dvs.group, pixels, S, M_pixels)
+    for t_end in dvs.stream(net, events, chunk_period=100 * ms):
+        pass
+    print('DVS events: ', len(events), ' output spikes: ', M_pixels.num_spikes)
+
 # Display the plots
 plt.show()
 
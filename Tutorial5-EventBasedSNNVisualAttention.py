@@ -15,15 +15,16 @@ to incoming data.
 
 Key components:
 - `Config`: A class that holds the parameters for the attention mechanism.
-- `initialise_attention`: A helper function to set up the attention network.
-- `run_attention`: A function that computes the saliency map based on the current window of events.
+- `AttentionSession`: A helper class that sets up the attention network and computes the saliency map
+  based on the current window of events.
 
 This implementation aims to demonstrate how attention mechanisms can be applied to dynamic
 visual data, enabling robots and systems to focus on relevant features in real-time.
 """
 
 import numpy as np
-from helpers.helpers import initialise_attention, run_attention
+from helpers.helpers import AttentionSession, EventStream, DisplaySink
+from helpers.retina import LogPolarRetina, foveated_attention
 import torch
 import cv2
 
@@ -44,9 +45,23 @@ class Config:
         'num_pyr': 6,  # Number of pyramid levels in the attention network
         'tau_mem': 0.3,  # Memory time constant for the attention mechanism
         'stride': 1,  # Stride for attention processing
-        'out_ch': 1  # Number of output channels
+        'out_ch': 1,  # Number of output channels
+        'kernel_cache_dir': None  # Folder where the Von Mises kernels are cached on disk (disabled if None)
     }
 
+    # Foveation Parameters (log-polar retina of Tutorial6, centred on the attended location)
+    RETINA_PARAMS = {
+        'foveate': False,  # Run the attention on the events pooled by the retina instead of the full sensor
+        'a': 1.3,  # Nonlinearity parameter for log-polar mapping
+        'rho0': 0.5,  # Blind spot radius
+        'R': 16,  # Number of eccentricity rings
+        'S': 24,  # Number of angular sectors
+        'cache_dir': None  # Folder where the retina is cached on disk (disabled if None)
+    }
+
+    # Attention on the (R, S) log-polar grid when foveating: smaller kernels and fewer scales, to fit the grid
+    FOVEA_ATTENTION_PARAMS = dict(ATTENTION_PARAMS, size_krn=8, r0=3, fltr_resize_perc=[1, 1], num_pyr=2)
+
 
 # Set the device for PyTorch (using Metal Performance Shaders on macOS if available)
 device = torch.device("mps" if torch.backends.mps.is_available() else "cpu")
@@ -54,62 +69,65 @@ device = torch.device("mps" if torch.backends.mps.is_available() else "cpu")
 # Initialize the configuration
 config = Config()
 
-# Load event data from a .npy file containing two objects
-data = np.load('data/twoobjects/twoobjects.npy')
-
-# Extract coordinates and properties from the data
-x, y, p, t = data[:, 0].astype(int), data[:, 1].astype(int), data[:, 2], data[:, 3] * 1e3
+# Load event data from a .npy file containing two objects (x, y, polarity and timestamp in seconds)
+events = EventStream.from_npy('data/twoobjects/twoobjects.npy')
 
 # Determine the resolution based on the maximum coordinates
-max_x = x.max() + 1  # Maximum x coordinate + 1 for resolution
-max_y = y.max() + 1  # Maximum y coordinate + 1 for resolution
+max_y, max_x = events.resolution  # Maximum coordinates + 1 for resolution
 resolution = (max_y, max_x)  # Resolution tuple for attention processing
 
-# Initialize saliency map and coordinates for maximum saliency
-saliency_map = np.zeros((max_y, max_x), dtype=np.float32)  # Saliency map initialized to zero
-salmax_coords = np.zeros((2,), dtype=np.int32)  # Array to hold coordinates of maximum saliency
-
-##### Attention Mechanism #####
-# Initialize the attention modules with the specified device and parameters
-net_attention = initialise_attention(device, config.ATTENTION_PARAMS)
-
 # Set the time window period for processing events (in milliseconds)
 window_period = 100  # Time window in milliseconds
-time = window_period  # Initialize the time variable
-window = torch.zeros((1, max_y, max_x), dtype=torch.float32)  # Create a tensor to hold the current window of events
-
-# Iterate through the event data
-for xi, yi, pi, ti in zip(x, y, p, t):
-    if ti <= time:
-        # If the event time is within the current time window, update the window
-        window[0][yi][xi] = 255  # Mark the pixel corresponding to the event
-    else:
-        # If the event time exceeds the current time window, process the attention
-        saliency_map[:], salmax_coords[:] = run_attention(window, net_attention, device, resolution,
-                                                          config.ATTENTION_PARAMS['num_pyr'])
-
-        # Apply a color map to the window for better visualization
-        window_map_jet = cv2.applyColorMap(window.detach().cpu().numpy().squeeze(0).astype(np.uint8), cv2.COLORMAP_JET)
-        # Add a title to the visualization
-        cv2.putText(window_map_jet, 'Events map', (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1,
-                    (0, 0, 255), 2, cv2.LINE_AA)
-
-        # Draw a circle at the location of maximum saliency on the visualization
-        cv2.circle(window_map_jet, (salmax_coords[1], salmax_coords[0]), 6, (255, 255, 255), 4)
-        cv2.putText(window_map_jet, 'Visual Attention', (10, 70), cv2.FONT_HERSHEY_SIMPLEX, 1,
-                    (255, 255, 255), 2, cv2.LINE_AA)
-
-        # Display the events map and saliency map
-        cv2.imshow('Events map and Saliency Map', window_map_jet)
-
-        # Wait for a key press to update the display
-        cv2.waitKey(1)
-
-        # Increment the time by the window period for the next iteration
-        time += window_period
-
-        # Reset the window for the next time period
-        window = torch.zeros((1, max_y, max_x), dtype=torch.float32)
-
-# Clean up by closing the OpenCV window after processing all events
-cv2.destroyAllWindows()
+
+# Time (in seconds) from which to process the recording, the events before it are skipped by seeking
+start_time = 0
+recording = events.seek(start_time * 10 ** 6)
+
+##### Attention Mechanism #####
+if config.RETINA_PARAMS['foveate']:
+    # Foveation: the events of each window are pooled by the retina and the attention runs on the (R, S) log-polar
+    # grid of the pooled events. The attended receptive field becomes the centre of the retina for the next window.
+    # The retina is twice the size of the sensor so that it covers the whole sensor wherever it is centred
+    retina = LogPolarRetina.cached(config.RETINA_PARAMS['a'], config.RETINA_PARAMS['rho0'], config.RETINA_PARAMS['R'],
+                                   config.RETINA_PARAMS['S'], 2 * max_x, 2 * max_y,
+                                   cache_dir=config.RETINA_PARAMS['cache_dir'])
+    # Pooled events shown at the centres of their receptive fields, and the fixation point as (row, column)
+    windows = ((foveated, (fixation[1], fixation[0])) for foveated, _, fixation in
+               foveated_attention(recording, device, config.FOVEA_ATTENTION_PARAMS, retina,
+                                  window_period * 10 ** 3, resolution=resolution))
+else:
+    # Initialize the attention session with the specified device and parameters: it owns the attention network,
+    # the window of events and the saliency map, and keeps the membrane state of the network across windows
+    session = AttentionSession(device, config.ATTENTION_PARAMS, resolution)
+    # Events of every time window, and the maximum of its saliency map (which stays on the device)
+    windows = ((chunk, session.step(chunk)[1])
+               for chunk in recording.time_chunks(window_period * 10 ** 3))  # Window period in microseconds
+
+# Display the maps without letting the GUI pace the processing (on their own thread, except on macOS where
+# OpenCV windows must stay on the main thread and frames are dropped instead)
+# (use NullSink() to run headless or VideoSink('attention.mp4') to record the maps)
+sink = DisplaySink('Events map and Saliency Map')
+
+# Iterate through the event data one time window at a time
+for window_events, salmax_coords in windows:
+    # Mark the events of the current time window
+    window = np.zeros(resolution, dtype=np.uint8)
+    window[window_events.y, window_events.x] = 255
+
+    # Apply a color map to the window for better visualization
+    window_map_jet = cv2.applyColorMap(window, cv2.COLORMAP_JET)
+    # Add a title to the visualization
+    cv2.putText(window_map_jet, 'Events map', (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1,
+                (0, 0, 255), 2, cv2.LINE_AA)
+
+    # Draw a circle at the location of maximum saliency on the visualization
+    cv2.circle(window_map_jet, (int(salmax_coords[1]), int(salmax_coords[0])), 6, (255, 255, 255), 4)
+    cv2.putText(window_map_jet, 'Visual Attention', (10, 70), cv2.FONT_HERSHEY_SIMPLEX, 1,
+                (255, 255, 255), 2, cv2.LINE_AA)
+
+    # Display the events map and saliency map
+    sink.write(window_map_jet)
+
+# Clean up by closing the display after processing all events
+sink.close()
+print('Processed %d windows at %.1f windows/s' % (sink.frames, sink.fps))
@@ -8,122 +8,27 @@ Each receptive field (RF) represents the region of the visual field captured by
 
 import numpy as np
 import matplotlib.pyplot as plt
-import sinabs.layers as sl  # Importing necessary layers from the Sinabs library for spiking neurons
 import torch
+from helpers.neurons import EventDrivenLIF  # Population of LIF neurons updated only when they receive input
+from helpers.retina import LogPolarRetina, FoveatedCompressor  # Geometry of the RFs and pixel to RF mapping
+from helpers.helpers import EventStream
 import matplotlib
 matplotlib.use('qt5agg')  # Configures matplotlib to use the Qt5 backend for interactive graphics
 
-class RFs:
-    # Class to define properties of a neuron with a receptive field (RF).
-    def __init__(self, tau_mem):
-        self.neuron = sl.LIF(tau_mem=tau_mem)  # Leaky Integrate-and-Fire neuron model
-        self.vmem = []  # Membrane potential history
-        self.spikes_ts = []  # Spike timestamps
-        self.cx: int = 0  # x-coordinate of the RF center
-        self.cy: int = 0  # y-coordinate of the RF center
-        self.radius: int = 0  # Radius of the receptive field
-        self.R: int = 0  # Eccentricity ring
-        self.S: int = 0  # Sector of the visual field
-        self.ID: int = 0  # Unique ID for the neuron
-
-# Function to rescale the rho value to ensure it fits within the defined plot dimensions.
-def rescale_rho(rho, max_rho, R):
-    # The rescaling ensures that the rho value remains proportional while fitting within the maximum defined radius.
-    return (rho / (rho0 * a ** R)) * max_rho
-
-# Function to convert polar coordinates (rho, psi) to Cartesian coordinates (x, y).
-def polar_to_cartesian(rho, psi):
-    # Converts polar coordinates to Cartesian coordinates for plotting
-    x = rho * np.cos(psi)
-    y = rho * np.sin(psi)
-    return x, y
-
-# Function to compute the size of a receptive field based on its eccentricity (rho).
-# If rho is less than rho0 (the blind spot), no receptive field is generated.
-def compute_rf_size(rho, W_max, rho0, R):
-    if rho < rho0:
-        return 0  # No receptive fields inside the blind spot
-    rf_size = W_max * (rho / R)  # Scale the RF size based on eccentricity
-    return rf_size
-
-# Function to plot the Gaussian shape of a receptive field centered at (cx, cy) with a specified radius.
-def gaussian_plot(neurons, ID, window):
-    # Draws a Gaussian-shaped receptive field at the center (cx, cy)
-    sigma = neurons[ID].radius / 2.0  # Standard deviation for the Gaussian shape
-    for i in range(-neurons[ID].radius, neurons[ID].radius):
-        for j in range(-neurons[ID].radius, neurons[ID].radius):
-            if (neurons[ID].cy + i) >= 0 and (neurons[ID].cy + i) < height and (neurons[ID].cx + j) >= 0 and (neurons[ID].cx + j) < width:
-                distance = np.sqrt(i ** 2 + j ** 2)
-                if distance <= neurons[ID].radius:
-                    gaussian_value = np.exp(-(distance ** 2) / (2 * sigma ** 2))  # Gaussian function
-                    window[neurons[ID].cy + i, neurons[ID].cx + j] = gaussian_value * 255  # Apply Gaussian to window
-    return window
-
-# Function to create a grid of eccentric receptive fields (RFs) for the retina model.
-def create_eccentric_RFs():
-    neurons = [RFs(tau_mem=tau_mem) for _ in range(R * S)]  # Initialize neurons
-    neuronID = 0
-
-    # Compute W_max, the maximum receptive field size, based on Equation 4.
-    W_max = rho0 * (a ** R) * (1 - a ** (-1))
-
-    # Calculate the maximum rho value based on plot dimensions.
-    max_rho = np.sqrt((width / 2) ** 2 + (height / 2) ** 2)
-
-    # Create an empty mask initialized to -1 (or any value to indicate no receptive field).
-    mask = [[[] for _ in range(width)] for _ in range(height)]
-
+# Function to plot the eccentric receptive fields (RFs) of the retina model.
+def create_eccentric_RFs(retina):
     # Set up the plot for visualizing the receptive fields
     fig, ax = plt.subplots()
     ax.set_aspect('equal')  # Ensure equal scaling on both axes
 
-    # Loop over eccentricity rings (r) and angular sectors (s)
-    for r in range(1, R + 1):
-        rho = rho0 * (a ** r)  # Calculate eccentricity
-        rescaled_rho = rescale_rho(rho, max_rho, R)  # Rescale to fit the plot
-
-        # Loop through each sector
-        for s in range(S):
-            psi = 2 * np.pi * s / S  # Angular displacement in polar coordinates
-            cx, cy = polar_to_cartesian(rescaled_rho, psi)  # Convert to Cartesian coordinates
-
-            # Shift the coordinates to center them in the plot
-            cx += width // 2
-            cy += height // 2
-
-            # Skip neurons whose receptive fields are out of bounds
-            if cx < 0 or cx >= width or cy < 0 or cy >= height:
-                continue
-
-            circle_radius = int(compute_rf_size(rho, W_max, rho0, R))  # Compute RF size
-
-            # Initialize neuron properties
-            neurons[neuronID].cx = int(cx)
-            neurons[neuronID].cy = int(cy)
-            neurons[neuronID].radius = circle_radius
-            neurons[neuronID].R = int(r)
-            neurons[neuronID].S = int(s)
-            neurons[neuronID].ID = neuronID
+    # Plot the receptive field circles
+    for cx, cy, radius in zip(retina.cx, retina.cy, retina.radius):
+        circle = plt.Circle((cx, cy), radius, color='k', fill=False)
+        ax.add_patch(circle)  # Add the circle to the plot
 
-            # Plot the receptive field circle
-            circle = plt.Circle((cx, cy), circle_radius, color='k', fill=False)
-            ax.add_patch(circle)  # Add the circle to the plot
-
-            # Mark the center with a small red dot
-            plt.scatter(cx, cy, color='r', s=1)
-
-            # Update the mask with the neuron ID for pixels inside the receptive field
-            for i in range(-circle_radius, circle_radius + 1):
-                for j in range(-circle_radius, circle_radius + 1):
-                    if i ** 2 + j ** 2 <= circle_radius ** 2:  # Pixel inside the circle
-                        x_pixel = int(cx + j)
-                        y_pixel = int(cy + i)
-                        if 0 <= x_pixel < width and 0 <= y_pixel < height:
-                            mask[y_pixel][x_pixel].append(neuronID)
-
-            neuronID += 1
-
-    return neurons, mask, ax
+    # Mark the centers with small red dots
+    plt.scatter(retina.cx, retina.cy, color='r', s=1)
+    return ax
 
 # Define camera and neuron parameters
 width = 128
@@ -149,11 +54,14 @@ x = np.random.randint(0, width, lenstim)
 y = np.random.randint(0, height, lenstim)
 p = np.zeros(lenstim).astype(int)
 
-# Generate the receptive fields and mask
-[neurons, mask, ax] = create_eccentric_RFs()
+# Generate the receptive fields and the mask (loaded from retina_cache_dir when it was already built with these parameters)
+retina_cache_dir = None
+retina = LogPolarRetina.cached(a, rho0, R, S, width, height, cache_dir=retina_cache_dir)
+ax = create_eccentric_RFs(retina)
+spikes_ts = [[] for _ in range(retina.num_neurons)]  # Spike timestamps of every neuron
 
 # Print the number of neurons generated
-print('Number of neurons: ', len(neurons))
+print('Number of neurons: ', retina.num_neurons)
 
 # Create a window to store and plot spikes
 plt.figure()
@@ -161,25 +69,38 @@ window = np.zeros((height + 1, width + 1))
 windows = []
 tw = 20
 
-# Simulate and visualize spikes over time
+# Simulate the Leaky Integrate-and-Fire neurons of all the receptive fields at once
+population = EventDrivenLIF(retina.num_neurons, tau_mem=tau_mem)
+t_events = np.arange(0, lenstim - 1)
+# Get the neuron IDs for the x, y position of every event from the mask: each event is an input to all of them
+input_ids, event_index, _ = retina.inputs(x[t_events], y[t_events])
+input_ts = t_events[event_index]
 with torch.no_grad():  # Disable gradient computation
-    for t in range(0, lenstim - 1):
-        # Get the list of neuron IDs for the current x, y position
-        IDs = mask[y[t]][x[t]]
-        for ID in IDs:
-            # Compute the neuron's spike output and plot the receptive field
-            out = neurons[ID].neuron(ts[:, t:t + 1]) / (neurons[ID].radius ** 2)
-            if (out != 0).any():  # If the neuron produces a spike
-                neurons[ID].spikes_ts.append(t)  # Record the spike time
-                gaussian_plot(neurons, ID, window)
-                if t > t_window:
-                    # Update the plot with the spike window
-                    plt.imshow(window, cmap='jet')
-                    windows.append(np.copy(window))  # Store window for GIF
-                    plt.draw()
-                    plt.pause(0.0001)
-                    window = np.zeros((height + 1, width + 1))  # Reset the window
-                    t_window = t + tw
+    spike_ids, spike_ts, _ = population(input_ids, input_ts, ts[0, input_ts, 0])
+
+# Visualize the spikes over time
+spiked = []
+for ID, t in zip(spike_ids.tolist(), spike_ts.int().tolist()):
+    # Record the spike time of the neuron that produced the spike
+    spikes_ts[ID].append(t)
+    spiked.append(ID)
+    if t > t_window:
+        # Plot the receptive fields of all the neurons that spiked in the window at once
+        retina.render(window, spiked)
+        spiked = []
+        # Update the plot with the spike window
+        plt.imshow(window, cmap='jet')
+        windows.append(np.copy(window))  # Store window for GIF
+        plt.draw()
+        plt.pause(0.0001)
+        window = np.zeros((height + 1, width + 1))  # Reset the window
+        t_window = t + tw
 
 # Optionally save the simulation as a GIF
 # imageio.mimsave('windows.gif', windows, duration=0.1)
+
+# Foveated compression: pool the events (one every millisecond) into log-polar events of the (R, S) neurons, in 10 ms bins
+compressor = FoveatedCompressor(retina, dt=10 ** 4)
+events = EventStream(x, y, np.arange(lenstim) * 10 ** 3, p)
+pooled, weights = compressor(events, flush=True)
+print('Log-polar events: ', len(pooled), ' compression ratio: ', compressor.compression_ratio)
@@ -0,0 +1,273 @@
+'''
+Benchmarks of the event processing hot paths: framing (time window, sliding window, number of events),
+attention, OMS and log-polar retina.
+
+Every benchmark runs offline on deterministic synthetic events (a bar sweeping the sensor plus uniform
+noise, generated from a fixed seed) at several sensor sizes, event rates and window lengths. For each one
+the script reports the throughput in events/s, the latency percentiles of a window (or batch) and the peak
+memory, and saves everything to a JSON file. Every benchmark runs in a fresh process, so that the maximum
+resident set size reported is its own, torch allocations included. Passing the JSON file of an earlier run with --compare prints
+the change of every benchmark.
+
+Usage (from the repository root):
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --sizes small --output new.json --compare results.json
+'''
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Repository root, for helpers
+from helpers.helpers import (EventStream, AttentionSession, time_window_frames, sliding_window_frames,
+                             number_events_frames)
+from helpers.oms import FusedOMS
+from helpers.retina import LogPolarRetina, FoveatedCompressor, foveated_attention
+
+
+# Sensor resolution (height, width), event rate (events/s) and duration (s) of the synthetic recordings
+SIZES = {
+    'small': ((128, 128), 2 * 10 ** 5, 1.0),
+    'medium': ((260, 346), 10 ** 6, 1.0),
+    'large': ((480, 640), 3 * 10 ** 6, 1.0),
+}
+WINDOWS_MS = (10, 50)  # Window lengths
+
+# Parameters of Tutorial5 and Tutorial7
+ATTENTION_PARAMS = {
+    'size_krn': 16, 'r0': 14, 'rho': 0.05, 'theta': np.pi * 3 / 2, 'thetas': np.arange(0, 2 * np.pi, np.pi / 4),
+    'thick': 3, 'fltr_resize_perc': [2, 2], 'offsetpxs': 0, 'offset': (0, 0), 'num_pyr': 6, 'tau_mem': 0.3,
+    'stride': 1, 'out_ch': 1,
+}
+OMS_PARAMS = {
+    'size_krn_center': 8, 'sigma_center': 1, 'size_krn_surround': 8, 'sigma_surround': 4, 'threshold': 0.86,
+    'tau_memOMS': 0.02, 'sc': 1, 'ss': 1,
+}
+FOVEA_ATTENTION_PARAMS = dict(ATTENTION_PARAMS, size_krn=8, r0=3, fltr_resize_perc=[1, 1], num_pyr=2)
+RETINA_PARAMS = {'a': 1.3, 'rho0': 0.5, 'R': 16, 'S': 24}
+
+
+def synthetic_events(resolution, rate, duration, seed=0):
+    """Deterministic recording: 80% of the events on a bar sweeping the sensor, 20% uniform noise."""
+    height, width = resolution
+    rng = np.random.default_rng(seed)
+    num_events = int(rate * duration)
+    ts = np.sort(rng.integers(0, int(duration * 10 ** 6), num_events))
+    on_bar = rng.random(num_events) < 0.8
+    x = rng.integers(0, width, num_events)
+    bar_x = (ts / (duration * 10 ** 6) * width).astype(np.int64) + rng.integers(-2, 3, num_events)  # Bar 5 px wide
+    x[on_bar] = np.clip(bar_x[on_bar], 0, width - 1)
+    y = rng.integers(0, height, num_events)
+    pol = rng.integers(0, 2, num_events)
+    return EventStream(x.astype(np.int16), y.astype(np.int16), ts, pol.astype(np.int8))  # Compact dtypes, no cast per chunk
+
+
+# Each benchmark is a generator that yields once when its setup is done (not timed), then processes the
+# events one window (or batch) per iteration
+
+def bench_time_window(events, window_us):
+    yield
+    for _ in time_window_frames(events.x, events.y, events.ts, events.pol, *events.resolution, window_us):
+        yield
+
+
+def bench_sliding_window(events, window_us):
+    # Window of window_us sliding by a fifth of it
+    yield
+    for _ in sliding_window_frames(events.x, events.y, events.ts, events.pol, *events.resolution, window_us,
+                                   window_us / 5):
+        yield
+
+
+def bench_number_events(events, window_us):
+    # As many events per frame as the time window holds on average, 32 frames per iteration
+    num_events = max(int(len(events) * window_us / max(events.time_range[1], 1)), 1)
+    yield
+    for _ in number_events_frames(events.x, events.y, events.pol, *events.resolution, num_events):
+        yield
+
+
+def bench_attention(events, window_us):
+    session = AttentionSession(torch.device('cpu'), ATTENTION_PARAMS, events.resolution)
+    yield
+    for chunk in events.time_chunks(window_us):
+        session.step(chunk)
+        yield
+
+
+def bench_foveated_attention(events, window_us):
+    # Retina twice the sensor size, attention on its (R, S) grid, as Tutorial5 with foveation
+    retina = LogPolarRetina(width=2 * events.resolution[1], height=2 * events.resolution[0], **RETINA_PARAMS)
+    yield
+    for _ in foveated_attention(events, torch.device('cpu'), FOVEA_ATTENTION_PARAMS, retina, window_us):
+        yield
+
+
+def bench_oms(events, window_us, batch_frames=16):
+    oms = FusedOMS(torch.device('cpu'), OMS_PARAMS)
+    frames = np.stack([pos.astype(np.float32) for pos, _ in
+                       time_window_frames(events.x, events.y, events.ts, events.pol, *events.resolution, window_us)])
+    yield
+    for start in range(0, len(frames), batch_frames):
+        oms(torch.from_numpy(frames[start:start + batch_frames]).unsqueeze(1))
+        yield
+
+
+def bench_retina_build(events, window_us, repeats=3):
+    yield
+    for _ in range(repeats):
+        LogPolarRetina(width=events.resolution[1], height=events.resolution[0], **RETINA_PARAMS)
+        yield
+
+
+def bench_retina_compress(events, window_us):
+    retina = LogPolarRetina(width=events.resolution[1], height=events.resolution[0], **RETINA_PARAMS)
+    compressor = FoveatedCompressor(retina, dt=window_us)
+    yield
+    for chunk in events.time_chunks(window_us):
+        compressor(chunk, flush=True)
+        yield
+
+
+# Benchmarks, and whether they process the events window by window (otherwise no events/s is reported)
+BENCHMARKS = {
+    'framing/time_window': (bench_time_window, True),
+    'framing/sliding_window': (bench_sliding_window, True),
+    'framing/number_events': (bench_number_events, True),
+    'attention/session_step': (bench_attention, True),
+    'attention/foveated': (bench_foveated_attention, True),
+    'oms/fused_batch': (bench_oms, True),
+    'retina/build': (bench_retina_build, False),
+    'retina/compress': (bench_retina_compress, True),
+}
+
+
+def max_rss():
+    """Maximum resident set size of this process in bytes, None where it is not available (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 2 ** 10  # Bytes on macOS, kilobytes on Linux and BSD
+
+
+def measure(benchmark, events, window_us, max_iterations=None):
+    """
+    Time every iteration of a benchmark.
+
+    Returns:
+        result (dict): Throughput, latency percentiles (ms) and maximum resident set size of the process (MB).
+    """
+    latencies = []
+    iterations = benchmark(events, window_us)
+    next(iterations)  # Setup
+    start = time.perf_counter()
+    while max_iterations is None or len(latencies) < max_iterations:
+        tic = time.perf_counter()
+        if next(iterations, StopIteration) is StopIteration:
+            break
+        latencies.append(time.perf_counter() - tic)
+    total = time.perf_counter() - start
+    iterations.close()
+
+    latencies = np.array(latencies) * 10 ** 3
+    processed = len(events) if max_iterations is None or len(latencies) < max_iterations else None
+    rss = max_rss()
+    return {
+        'iterations': len(latencies),
+        'seconds': total,
+        'events_per_s': processed / total if processed and total > 0 else None,
+        'latency_ms': {name: float(np.percentile(latencies, q)) if len(latencies) else None
+                       for name, q in (('p50', 50), ('p90', 90), ('p99', 99), ('max', 100))},
+        'max_rss_mb': rss / 2 ** 20 if rss is not None else None,
+    }
+
+
+def measure_isolated(name, size, window_us, max_iterations=None):
+    """
+    Measure a benchmark in the current process, meant to be a fresh one (see run).
+
+    The maximum resident set size is recorded before the benchmark too (interpreter, libraries and
+    synthetic events), as base_rss_mb.
+    """
+    torch.manual_seed(0)
+    events = synthetic_events(*SIZES[size])
+    base = max_rss()
+    result = measure(BENCHMARKS[name][0], events, window_us, max_iterations)
+    result.update({'num_events': len(events), 'base_rss_mb': base / 2 ** 20 if base is not None else None})
+    return result
+
+
+def run(sizes, benchmarks, max_iterations):
+    # Spawned rather than forked processes: a forked process starts from the resident set size of its parent
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for size in sizes:
+        resolution, rate, duration = SIZES[size]
+        for name in benchmarks:
+            per_window = BENCHMARKS[name][1]
+            for window_ms in (WINDOWS_MS if per_window else WINDOWS_MS[:1]):
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    result = pool.submit(measure_isolated, name, size, window_ms * 10 ** 3, max_iterations).result()
+                if not per_window:
+                    result['events_per_s'] = None
+                result.update({'benchmark': name, 'size': size, 'resolution': list(resolution), 'rate': rate,
+                               'window_ms': window_ms if per_window else None})
+                results.append(result)
+                print('%-24s %-7s %4s ms  %12s ev/s  p50 %8.2f ms  p99 %8.2f ms  max RSS %7s MB (base %s MB)' % (
+                    name, size, window_ms if per_window else '-',
+                    '%.0f' % result['events_per_s'] if result['events_per_s'] else '-',
+                    result['latency_ms']['p50'] or 0, result['latency_ms']['p99'] or 0,
+                    '%.1f' % result['max_rss_mb'] if result['max_rss_mb'] is not None else '-',
+                    '%.1f' % result['base_rss_mb'] if result['base_rss_mb'] is not None else '-'))
+    return results
+
+
+def compare(results, previous, tolerance=0.1):
+    """Print the change of throughput and median latency of every benchmark also in previous."""
+    key = lambda result: (result['benchmark'], result['size'], result['window_ms'])
+    previous = {key(result): result for result in previous}
+    print('\nChange against the previous run (+ is faster):')
+    for result in results:
+        old = previous.get(key(result))
+        if old is None or not old['latency_ms']['p50'] or not result['latency_ms']['p50']:
+            continue
+        speedup = old['latency_ms']['p50'] / result['latency_ms']['p50'] - 1
+        flag = '  REGRESSION' if speedup < -tolerance else ''
+        print('%-24s %-7s %4s ms  p50 %+7.1f%%%s' % (result['benchmark'], result['size'], result['window_ms'] or '-',
+                                                      100 * speedup, flag))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='small,medium', help='Comma separated sizes among ' + ', '.join(SIZES))
+    parser.add_argument('--benchmarks', default=','.join(BENCHMARKS), help='Comma separated benchmarks')
+    parser.add_argument('--max-iterations', type=int, default=None,
+                        help='Stop every benchmark after this many windows (no events/s is reported then)')
+    parser.add_argument('--output', default='benchmark_results.json', help='JSON file of the results')
+    parser.add_argument('--compare', default=None, help='JSON file of a previous run to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='Slowdown of the median latency flagged as a regression when comparing')
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    results = run(args.sizes.split(','), args.benchmarks.split(','), args.max_iterations)
+    meta = {'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'platform': platform.platform(),
+            'python': platform.python_version(), 'numpy': np.__version__, 'torch': torch.__version__,
+            'cpus': os.cpu_count(), 'torch_threads': torch.get_num_threads()}
+    with open(args.output, 'w') as f:
+        json.dump({'meta': meta, 'results': results}, f, indent=1)
+    print('Results saved to', args.output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f)['results'], args.tolerance)
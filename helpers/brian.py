@@ -0,0 +1,182 @@
+import os
+
+import numpy as np
+from brian2 import NeuronGroup, SpikeGeneratorGroup, SpikeMonitor, Network, ms, second, device, get_device, set_device
+
+
+# Network of Tutorial4, with tau a per-neuron parameter so that it can change between runs without
+# generating new code
+TUTORIAL4_EQS = '''
+dv/dt = (v0 - v) / tau : 1 (unless refractory)  # Membrane potential dynamics
+v0 : 1  # Baseline membrane potential for each neuron
+tau : second (constant)  # Time constant of each neuron
+'''
+
+
+class BrianSweep:
+    """
+    Runs of the Tutorial4 network for many (tau, v0_max) configurations, built once.
+
+    In runtime mode the network is stored after it is built and restored before every run, with
+    the new tau and v0 values injected into the group. With standalone_dir, the network is generated
+    as C++ (cpp_standalone) and compiled once in standalone_dir/N<N>, then every configuration is a
+    run of the same binary with different initial values. The build folder is kept, so later
+    processes only recompile what changed. The standalone device is global, so only the last
+    standalone BrianSweep of a process can run.
+
+    Args:
+        N (int): Number of neurons.
+        duration (brian2.Quantity): Duration of every run.
+        standalone_dir (str): Folder of the C++ standalone builds, runtime mode if None.
+    """
+
+    def __init__(self, N, duration=1000 * ms, standalone_dir=None):
+        self.N = N
+        self.duration = duration
+        self.standalone = standalone_dir is not None
+        self.directory = None
+        if self.standalone:
+            self.directory = os.path.abspath(os.path.join(standalone_dir, 'N%d' % N))
+            if get_device().__class__.__name__ == 'CPPStandaloneDevice':
+                device.reinit()  # Allow a new build in the same process
+                device.activate(directory=self.directory, build_on_run=False)
+            else:
+                set_device('cpp_standalone', directory=self.directory, build_on_run=False)
+
+        self.G = NeuronGroup(N, TUTORIAL4_EQS, threshold='v > 1', reset='v = 0', refractory=5 * ms, method='exact')
+        self.M = SpikeMonitor(self.G)
+        self.net = Network(self.G, self.M)
+        self.G.tau = 10 * ms
+        self.G.v0 = 0
+
+        if self.standalone:
+            self.net.run(duration, namespace={})
+            device.build(directory=self.directory, run=False)  # Generate and compile the code once
+        else:
+            self.net.store()
+
+    def run(self, tau, v0_max):
+        """
+        Run one configuration.
+
+        Args:
+            tau (brian2.Quantity): Time constant of all the neurons.
+            v0_max (float): Maximum baseline potential, neuron i has v0 = i * v0_max / (N - 1).
+
+        Returns:
+            counts (np.ndarray): Number of spikes of every neuron.
+            spike_i (np.ndarray): Neuron of every spike.
+            spike_t (np.ndarray): Time of every spike, in seconds.
+        """
+        v0_values = np.arange(self.N) * v0_max / max(self.N - 1, 1)
+        tau_values = np.full(self.N, float(tau / second)) * second
+        if self.standalone:
+            if os.path.abspath(get_device().project_dir) != self.directory:
+                raise RuntimeError('A later standalone BrianSweep replaced the build of this one')
+            device.run(run_args={self.G.tau: tau_values, self.G.v0: v0_values})
+        else:
+            self.net.restore()  # Back to the state after the network was built, with an empty monitor
+            self.G.tau = tau_values
+            self.G.v0 = v0_values
+            self.net.run(self.duration, namespace={})  # All the variables of the equations are internal
+        # Copies: the monitor arrays are overwritten by the next run
+        return np.array(self.M.count[:]), np.array(self.M.i[:]), np.array(self.M.t_[:])
+
+    def sweep(self, taus, v0_maxs):
+        """
+        Run every (tau, v0_max) configuration of the grid.
+
+        Args:
+            taus (list): Time constants (brian2.Quantity).
+            v0_maxs (list): Maximum baseline potentials.
+
+        Returns:
+            counts (np.ndarray): (len(taus), len(v0_maxs), N) number of spikes of every neuron.
+            spike_indptr (np.ndarray): (len(taus) * len(v0_maxs) + 1,) offsets of the spikes of every
+                configuration (row-major) in spike_i and spike_t.
+            spike_i, spike_t (np.ndarray): Neuron and time (seconds) of all the spikes.
+        """
+        counts = np.zeros((len(taus), len(v0_maxs), self.N), dtype=np.int64)
+        spike_indptr = np.zeros(len(taus) * len(v0_maxs) + 1, dtype=np.int64)
+        spike_i, spike_t = [], []
+        for k, (a, b) in enumerate(np.ndindex(len(taus), len(v0_maxs))):
+            counts[a, b], i, t = self.run(taus[a], v0_maxs[b])
+            spike_indptr[k + 1] = spike_indptr[k] + len(i)
+            spike_i.append(i)
+            spike_t.append(t)
+        return counts, spike_indptr, np.concatenate(spike_i), np.concatenate(spike_t)
+
+
+def dvs_spike_indices(x, y, pol, ts, resolution, dt):
+    """
+    Map DVS events to SpikeGeneratorGroup neuron indices and time bins.
+
+    Pixel (x, y) of polarity pol is neuron (pol * height + y) * width + x. A SpikeGeneratorGroup
+    accepts at most one spike per neuron and time step, so the events of a pixel and polarity within
+    the same dt bin are merged into one spike.
+
+    Args:
+        x, y, pol, ts (np.ndarray): Events, ts in microseconds.
+        resolution (tuple): (height, width) of the sensor.
+        dt (int): Time step in microseconds.
+
+    Returns:
+        indices (np.ndarray): Neuron of every spike, sorted by time.
+        bins (np.ndarray): Time step of every spike, ts // dt.
+    """
+    height, width = resolution
+    num_neurons = 2 * height * width
+    indices = ((np.asarray(pol, dtype=np.int64) > 0) * height + np.asarray(y, dtype=np.int64)) * width + np.asarray(x)
+    keys = np.unique(np.asarray(ts, dtype=np.int64) // dt * num_neurons + indices)  # Sorted by time, then neuron
+    return keys % num_neurons, keys // num_neurons
+
+
+class DVSInput:
+    """
+    SpikeGeneratorGroup replaying a DVS recording, chunk by chunk, into a Brian2 network.
+
+    The group has one neuron per pixel and polarity (see dvs_spike_indices). Only the spikes of the
+    current chunk are loaded into the group, so recordings of any length are replayed with the
+    memory of a single chunk. Runtime mode only: set_spikes between runs is not available in
+    standalone mode.
+
+    Args:
+        resolution (tuple): (height, width) of the sensor.
+        dt (brian2.Quantity): Time step of the group, usually the one of the network.
+    """
+
+    def __init__(self, resolution, dt=0.1 * ms):
+        self.resolution = (int(resolution[0]), int(resolution[1]))
+        self.dt = dt
+        self._dt_us = int(round(float(dt / second) * 10 ** 6))
+        self.group = SpikeGeneratorGroup(2 * self.resolution[0] * self.resolution[1], np.zeros(0, dtype=np.int64),
+                                         np.zeros(0) * second, dt=dt)
+
+    def stream(self, net, events, chunk_period=1000 * ms, namespace=None):
+        """
+        Run net over a recording, loading the spikes of one chunk at a time into the group.
+
+        The simulation time starts at the first event, rounded down to a time step. The network must
+        contain self.group and start at t = 0.
+
+        Args:
+            net (brian2.Network): Network to run.
+            events (EventStream): Recording to replay.
+            chunk_period (brian2.Quantity): Simulated time per chunk, a multiple of dt.
+            namespace (dict): Namespace of the network, the variables of the loop iterating over
+                stream if None (as for a run called there).
+
+        Yields:
+            t_end (int): End of the chunk just simulated, in recording microseconds.
+        """
+        if len(events) == 0:
+            return
+        chunk_us = int(round(float(chunk_period / second) * 10 ** 6)) // self._dt_us * self._dt_us
+        first, last = events.time_range
+        origin = first // self._dt_us * self._dt_us
+        for t_start in range(origin, last + 1, chunk_us):
+            chunk = events.slice_time(t_start, t_start + chunk_us)  # Events in [t_start, t_start + chunk)
+            indices, bins = dvs_spike_indices(chunk.x, chunk.y, chunk.pol, chunk.ts - origin, self.resolution, self._dt_us)
+            self.group.set_spikes(indices, bins * self.dt)
+            net.run((t_start + chunk_us - origin) * 1e-6 * second - net.t, namespace=namespace, level=1)
+            yield t_start + chunk_us
@@ -0,0 +1,90 @@
+import os
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import tonic
+from torch.utils.data import Dataset
+
+
+def _frames_cache_dir(dataset, sensor_size, time_window):
+    # Cache folder of a dataset split, keyed by the binning parameters
+    split = '' if not hasattr(dataset, 'train') else ('_train' if dataset.train else '_test')
+    location = getattr(dataset, 'location_on_system', 'data')
+    key = '%s_%dus' % ('x'.join(str(size) for size in sensor_size), time_window)
+    return os.path.join(location, 'frames' + split, key)
+
+
+_worker_dataset = None
+
+
+def _init_worker(dataset):
+    # Send the dataset to every worker once, instead of with every trial
+    global _worker_dataset
+    _worker_dataset = dataset
+
+
+def _bin_trial(index, sensor_size, time_window, path):
+    # Bin the events of a trial into frames and save them, through a temporary file so that an
+    # interrupted run never leaves a truncated trial behind
+    events, target = _worker_dataset[index]
+    frames = tonic.transforms.ToFrame(sensor_size=sensor_size, time_window=time_window)(events)
+    with open(path + '.tmp', 'wb') as f:
+        np.save(f, frames)
+    os.replace(path + '.tmp', path)
+    return int(target)
+
+
+class CachedFrameDataset(Dataset):
+    """
+    Frames of a tonic event dataset (e.g. DVSGesture), binned once and served from an on-disk cache.
+
+    Every trial is binned with tonic.transforms.ToFrame and saved as a .npy file in cache_dir, which
+    by default is a folder of the dataset keyed by sensor_size and time_window. Missing trials are
+    binned in parallel, one trial per process. Trials are then loaded memory-mapped, so repeated runs
+    and DataLoader workers only read the frames they use, from the page cache once warm. Where
+    processes cannot be forked (Windows), the script building the cache needs an
+    if __name__ == '__main__' guard.
+
+    Args:
+        dataset (tonic.Dataset): Dataset of (events, target) trials, without transform.
+        time_window (int): Duration of a frame in microseconds.
+        sensor_size (tuple): (width, height, polarities), the one of the dataset if None.
+        cache_dir (str): Folder of the cache.
+        num_workers (int): Number of processes binning the trials, all the CPUs if None.
+    """
+
+    def __init__(self, dataset, time_window, sensor_size=None, cache_dir=None, num_workers=None):
+        self.sensor_size = tuple(sensor_size or dataset.sensor_size)
+        self.time_window = time_window
+        self.cache_dir = cache_dir or _frames_cache_dir(dataset, self.sensor_size, time_window)
+        self.paths = [os.path.join(self.cache_dir, '%06d.npy' % index) for index in range(len(dataset))]
+
+        meta_path = os.path.join(self.cache_dir, 'meta.json')
+        targets = {}
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                targets = {int(index): target for index, target in json.load(f)['targets'].items()}
+
+        missing = [index for index, path in enumerate(self.paths) if index not in targets or not os.path.exists(path)]
+        if missing:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Forked workers do not re-run the calling script, which spawned workers would import again
+            context = multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else None)
+            with ProcessPoolExecutor(num_workers, mp_context=context, initializer=_init_worker,
+                                     initargs=(dataset,)) as pool:
+                binned = pool.map(_bin_trial, missing, [self.sensor_size] * len(missing),
+                                  [time_window] * len(missing), [self.paths[index] for index in missing])
+                targets.update(zip(missing, binned))
+            with open(meta_path, 'w') as f:
+                json.dump({'sensor_size': self.sensor_size, 'time_window': time_window, 'targets': targets}, f)
+        self.targets = [targets[index] for index in range(len(self.paths))]
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, index):
+        """Frames of shape (num_frames, polarities, height, width), memory-mapped, and target of a trial."""
+        # Copy-on-write mapping: the file is never modified but the frames can be handed to torch as they are
+        return np.load(self.paths[index], mmap_mode='c'), self.targets[index]
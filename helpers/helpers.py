@@ -1,8 +1,16 @@
+import os
+import sys
+import json
+import time
+import queue
+import threading
+import hashlib
+import contextlib
+from functools import lru_cache
 import numpy as np
 import cv2
 import numpy as np
 import cv2
-from collections import deque
 from scipy.special import iv
 import torch
 import numpy as np
@@ -11,123 +19,779 @@ import torch
 import torch.nn as nn
 import sinabs.layers as sl
 from skimage.transform import rescale, resize, downscale_local_mean
-import torchvision
 import torch.nn.functional as F
 
 
-def time_window(events, camera_events,height, width,window_period):
-    # Extract the 'x' and 'y' coordinates of events, their timestamps ('ts'), and polarity ('pol')
-    e_x = events['data'][camera_events]['dvs']['x']  # x-coordinates of events
-    e_y = events['data'][camera_events]['dvs']['y']  # y-coordinates of events
-    e_ts = np.multiply(events['data'][camera_events]['dvs']['ts'], 10 ** 3)  # Convert timestamps to milliseconds
-    e_pol = events['data'][camera_events]['dvs']['pol']  # Event polarity (1 for ON events, 0 for OFF events)
+def _timestamps(ts, ts_scale=None):
+    # Timestamps in microseconds of a column, multiplied by ts_scale and rounded if given
+    if ts_scale is None:
+        return np.asarray(ts, dtype=np.int64)
+    return np.round(np.asarray(ts) * ts_scale).astype(np.int64)
+
+
+def _search_timestamps(ts, t, side='left', ts_scale=None):
+    # np.searchsorted of t (microseconds, scalar or array) in _timestamps(ts, ts_scale), converting only the
+    # events within a microsecond of t: the conversion is monotonic, so all the others are on the right side
+    if ts_scale is None:
+        return np.searchsorted(ts, t, side=side)
+    t = np.asarray(t)
+    lo = np.atleast_1d(np.searchsorted(ts, (t - 1) / ts_scale, side='left'))
+    hi = np.atleast_1d(np.searchsorted(ts, (t + 1) / ts_scale, side='right'))
+    offsets = lo.copy()
+    for k in np.flatnonzero(hi > lo):
+        offsets[k] += np.searchsorted(_timestamps(ts[lo[k]:hi[k]], ts_scale), np.atleast_1d(t)[k], side=side)
+    return offsets if t.ndim else offsets[0]
+
+
+class TimeIndex:
+    """
+    Sparse index of sorted timestamps, storing the offset of the first event of every 'step' bucket.
+
+    seek only searches the events of one bucket, so on memory-mapped recordings it reads a few pages
+    instead of bisecting the whole timestamp array.
+
+    Args:
+        ts (np.ndarray): Sorted timestamps.
+        step (int): Duration of a bucket, in the same unit as ts.
+        offsets (np.ndarray): Precomputed offsets (e.g. loaded from the cache), built from ts if None.
+        ts_scale (float): Scale of raw ts columns (e.g. seconds), ts and step are in microseconds if None.
+    """
+
+    def __init__(self, ts, step=10 ** 4, offsets=None, ts_scale=None):
+        self.ts = ts
+        self.step = step
+        self.ts_scale = ts_scale
+        self.t0 = int(_timestamps(ts[:1], ts_scale)[0]) if len(ts) else 0
+        if offsets is None:
+            num_buckets = (int(_timestamps(ts[-1:], ts_scale)[0]) - self.t0) // step + 1 if len(ts) else 0
+            offsets = _search_timestamps(ts, self.t0 + np.arange(num_buckets + 1) * step, 'left', ts_scale)
+        self.offsets = offsets
+
+    def seek(self, t, side='left'):
+        """Offset of the first event with ts >= t (side='left') or ts > t (side='right')."""
+        bucket = int((t - self.t0) // self.step)
+        if bucket < 0:
+            return 0
+        if bucket >= len(self.offsets) - 1:
+            return len(self.ts)
+        lo, hi = self.offsets[bucket], self.offsets[bucket + 1]
+        return int(lo + _search_timestamps(self.ts[lo:hi], t, side, self.ts_scale))
+
+    def slice(self, t0, t1):
+        """Offsets (start, stop) of the events with t0 <= ts < t1."""
+        return self.seek(t0), self.seek(t1)
+
+
+def _window_edges(ts, window_period):
+    # Right edges of the windows (k * window_period, (k + 1) * window_period] covering the sorted timestamps
+    first = max(int(np.ceil(ts[0] / window_period)), 1)
+    last = max(int(np.ceil(ts[-1] / window_period)), 1)
+    return np.arange(first, last + 1) * window_period
+
+
+class EventStream:
+    """
+    Events stored as a struct of arrays with compact dtypes.
+
+    x and y are int16, pol is int8 (1 for ON events, 0 for OFF events) and ts is int64 in
+    microseconds. The columns are kept as given (e.g. memory-mapped, or strided columns of a (N, 4)
+    array with ts_scale) and only cast to these dtypes when x, y, ts or pol is read. Slicing returns a
+    view, and time_chunks/count_chunks yield views of consecutive chunks, so long recordings are
+    processed without copying or converting them: only the columns of the chunk being processed are
+    cast. seek and slice_time jump to any time through a TimeIndex, built on first use.
+
+    Args:
+        x, y (np.ndarray): x and y coordinates of the events.
+        ts (np.ndarray): Sorted timestamps in microseconds, or in units of ts_scale microseconds.
+        pol (np.ndarray): Event polarity.
+        index (TimeIndex): Index of ts, built on first use if None.
+        ts_scale (float): Factor converting ts to microseconds (rounded), e.g. 10 ** 6 for seconds.
+    """
+
+    def __init__(self, x, y, ts, pol, index=None, ts_scale=None):
+        # Cast lists and other sequences once, arrays are cast on access
+        self._x = x if isinstance(x, np.ndarray) else np.asarray(x, dtype=np.int16)
+        self._y = y if isinstance(y, np.ndarray) else np.asarray(y, dtype=np.int16)
+        self._ts = ts if isinstance(ts, np.ndarray) else np.asarray(ts, dtype=np.float64 if ts_scale else np.int64)
+        self._pol = pol if isinstance(pol, np.ndarray) else np.asarray(pol, dtype=np.int8)
+        self.ts_scale = ts_scale
+        self._index = index
+
+    @classmethod
+    def from_bimvee(cls, events, camera_events):
+        """Wrap the output of bimvee importIitYarp, whose timestamps are in seconds."""
+        dvs = events['data'][camera_events]['dvs']
+        return cls(dvs['x'], dvs['y'], dvs['ts'], dvs['pol'], ts_scale=10 ** 6)
+
+    @classmethod
+    def from_array(cls, data, ts_scale=10 ** 6):
+        """Wrap a (N, 4) array of x, y, polarity and timestamp columns, timestamps are multiplied by ts_scale."""
+        return cls(data[:, 0], data[:, 1], data[:, 3], data[:, 2], ts_scale=ts_scale)
+
+    @classmethod
+    def from_npy(cls, path, ts_scale=10 ** 6):
+        """Memory-map a (N, 4) .npy recording such as data/twoobjects/twoobjects.npy, timestamps in seconds."""
+        return cls.from_array(np.load(path, mmap_mode='r'), ts_scale)
+
+    @classmethod
+    def from_tonic(cls, events):
+        """Wrap a tonic structured array with 'x', 'y', 't' (microseconds) and 'p' fields."""
+        return cls(events['x'], events['y'], events['t'], events['p'])
+
+    # The columns in their compact dtypes, no copy when they are already stored with them
+    @property
+    def x(self):
+        return np.asarray(self._x, dtype=np.int16)
+
+    @property
+    def y(self):
+        return np.asarray(self._y, dtype=np.int16)
+
+    @property
+    def ts(self):
+        return _timestamps(self._ts, self.ts_scale)
+
+    @property
+    def pol(self):
+        return np.asarray(self._pol, dtype=np.int8)
+
+    def __len__(self):
+        return len(self._ts)
+
+    def __getitem__(self, index):
+        return EventStream(self._x[index], self._y[index], self._ts[index], self._pol[index], ts_scale=self.ts_scale)
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = TimeIndex(self._ts, ts_scale=self.ts_scale)
+        return self._index
+
+    def seek(self, t):
+        """Events from time t (microseconds) to the end of the recording."""
+        return self[self.index.seek(t):]
+
+    def slice_time(self, t0, t1):
+        """Events with t0 <= ts < t1, in microseconds."""
+        start, stop = self.index.slice(t0, t1)
+        return self[start:stop]
+
+    @property
+    def time_range(self):
+        """Timestamps (first, last) in microseconds, without reading the other events."""
+        first, last = _timestamps(self._ts[[0, -1]], self.ts_scale)
+        return int(first), int(last)
+
+    @property
+    def resolution(self):
+        """Smallest (height, width) containing all the events."""
+        return int(np.max(self._y)) + 1, int(np.max(self._x)) + 1
+
+    def time_chunks(self, window_period):
+        """Yield the events with k * window_period < ts <= (k + 1) * window_period, window_period in microseconds."""
+        if len(self) == 0:
+            return
+        ends = _search_timestamps(self._ts, _window_edges(self.time_range, window_period), 'right', self.ts_scale)
+        start = 0
+        for end in ends:
+            yield self[start:end]
+            start = end
+
+    def count_chunks(self, num_events, stride=None):
+        """Yield chunks of num_events events starting every 'stride' events, the last chunk can be shorter."""
+        stride = num_events if stride is None else stride
+        for start in range(0, len(self), stride):
+            yield self[start:start + num_events]
+            if start + num_events >= len(self):
+                break
+
+
+EVENT_FIELDS = ('x', 'y', 'ts', 'pol')
+
+
+def _yarp_log_signature(filePathOrName):
+    # Size and modification time of every info.log/data.log in the recording, used to invalidate the cache
+    signature = {}
+    for root, _, files in os.walk(filePathOrName):
+        if '.eventcache' in root:
+            continue
+        for file in files:
+            if file in ('info.log', 'data.log'):
+                path = os.path.join(root, file)
+                stat = os.stat(path)
+                signature[os.path.relpath(path, filePathOrName)] = [stat.st_size, stat.st_mtime_ns]
+    return signature
+
+
+def load_yarp_events(filePathOrName, camera_events, codec='24bit', cache_dir=None):
+    """
+    Load the DVS events of a YARP recording through a memory-mapped columnar cache.
+
+    The first call decodes the recording with bimvee importIitYarp and saves one .npy file per field
+    in cache_dir (by default '.eventcache' inside the recording folder), together with the offsets
+    of its TimeIndex. Later calls open those files with np.memmap, so only the events that are
+    actually processed are read from disk. The cache is rebuilt when any info.log/data.log of the
+    recording changes.
+
+    Args:
+        filePathOrName (str): Path to the YARP recording.
+        camera_events (str): Camera from which events are extracted ('left' or 'right').
+        codec (str): Codec used to decode the event data.
+        cache_dir (str): Folder of the cache.
+
+    Returns:
+        events (EventStream): Memory-mapped events.
+    """
+    if cache_dir is None:
+        cache_dir = os.path.join(filePathOrName, '.eventcache', camera_events + '_' + codec)
+    meta_path = os.path.join(cache_dir, 'meta.json')
+    signature = _yarp_log_signature(filePathOrName)
+
+    meta = None
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+    if meta is None or meta['signature'] != signature or 'index_step' not in meta:
+        from bimvee.importIitYarp import importIitYarp
+        events = EventStream.from_bimvee(importIitYarp(filePathOrName=filePathOrName, codec=codec), camera_events)
+        os.makedirs(cache_dir, exist_ok=True)
+        if os.path.exists(meta_path):
+            os.remove(meta_path)  # Invalidate the cache until all the fields are written
+        for field in EVENT_FIELDS:
+            np.save(os.path.join(cache_dir, field + '.npy'), getattr(events, field))
+        np.save(os.path.join(cache_dir, 'index.npy'), events.index.offsets)
+        meta = {'signature': signature, 'num_events': len(events), 'index_step': events.index.step}
+        with open(meta_path, 'w') as f:
+            json.dump(meta, f)
+
+    x, y, ts, pol = (np.load(os.path.join(cache_dir, field + '.npy'), mmap_mode='r') for field in EVENT_FIELDS)
+    index = TimeIndex(ts, meta['index_step'], np.load(os.path.join(cache_dir, 'index.npy')))
+    return EventStream(x, y, ts, pol, index)
+
+
+def _as_stream(events, camera_events):
+    # Accept either an EventStream or the output of bimvee importIitYarp
+    return events if isinstance(events, EventStream) else EventStream.from_bimvee(events, camera_events)
+
+
+class FrameSink:
+    """
+    Destination of the frames produced by a processing loop.
+
+    Sinks count the frames they receive and the time since the first one, so the throughput of a
+    loop can be measured with any sink (e.g. NullSink to take the display out of the picture).
+    They are context managers and are closed on exit.
+    """
+
+    def __init__(self):
+        self.frames = 0
+        self.start = None
+
+    def write(self, frame):
+        if self.start is None:
+            self.start = time.perf_counter()
+        self.frames += 1
+        self._write(frame)
+
+    def _write(self, frame):
+        raise NotImplementedError
+
+    @property
+    def fps(self):
+        """Frames per second received since the first frame."""
+        if self.start is None:
+            return 0.0
+        return self.frames / max(time.perf_counter() - self.start, 1e-9)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class NullSink(FrameSink):
+    """Discard the frames, for headless runs and benchmarks."""
+
+    def _write(self, frame):
+        pass
+
+
+class VideoSink(FrameSink):
+    """
+    Write the frames to a video file, or to a PNG sequence when path is a folder (no extension).
+
+    Args:
+        path (str): Video file (e.g. 'events.mp4') or folder of the PNG sequence.
+        fps (float): Frame rate of the video.
+        fourcc (str): Codec of the video.
+    """
+
+    def __init__(self, path, fps=30, fourcc='mp4v'):
+        super().__init__()
+        self.path = path
+        self.fps_video = fps
+        self.fourcc = fourcc
+        self.writer = None
+        if not os.path.splitext(path)[1]:
+            os.makedirs(path, exist_ok=True)
+
+    def _write(self, frame):
+        if not os.path.splitext(self.path)[1]:
+            cv2.imwrite(os.path.join(self.path, 'frame_%06d.png' % (self.frames - 1)), frame)
+            return
+        if self.writer is None:  # The frame size is only known once the first frame arrives
+            self.writer = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*self.fourcc), self.fps_video,
+                                          (frame.shape[1], frame.shape[0]), frame.ndim == 3)
+        self.writer.write(frame)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.release()
+            self.writer = None
+
+
+class DisplaySink(FrameSink):
+    """
+    Show the frames with cv2.imshow, from a separate thread where the platform allows it.
+
+    In threaded mode frames go through a bounded queue, when it is full the oldest frame is dropped,
+    so the processing loop never waits for the display. OpenCV windows must be driven from the main
+    thread on macOS, so there (or with threaded=False) write shows the frames on the calling thread
+    instead, and drops the frames arriving less than 1 / max_fps after the last one shown so that
+    the display does not pace the loop.
+
+    Args:
+        window_name (str): Title of the OpenCV window.
+        maxsize (int): Number of frames waiting to be displayed, in threaded mode.
+        threaded (bool): Display from a separate thread, on all platforms but macOS if None.
+        max_fps (float): Largest display rate when the frames are shown on the calling thread.
+    """
+
+    def __init__(self, window_name, maxsize=2, threaded=None, max_fps=30):
+        super().__init__()
+        self.window_name = window_name
+        self.dropped = 0
+        self.threaded = sys.platform != 'darwin' if threaded is None else threaded
+        self.min_interval = 1 / max_fps
+        self.last_shown = None  # Time of the last frame shown on the calling thread
+        self.thread = None
+        if self.threaded:
+            self.queue = queue.Queue(maxsize=maxsize)
+            self.thread = threading.Thread(target=self._display, daemon=True)
+            self.thread.start()
+
+    def _show(self, frame):
+        cv2.imshow(self.window_name, frame)
+        cv2.waitKey(1)  # Allow the plot to be displayed interactively
+
+    def _display(self):
+        while True:
+            frame = self.queue.get()
+            if frame is None:
+                break
+            self._show(frame)
+        cv2.destroyWindow(self.window_name)
+
+    def _put(self, frame):
+        while True:
+            try:
+                self.queue.put_nowait(frame)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()  # Drop the oldest frame
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def _write(self, frame):
+        if self.threaded:
+            self._put(np.array(frame))  # Copy, the producer may overwrite the frame (e.g. SlidingWindowSurface views)
+            return
+        now = time.perf_counter()
+        if self.last_shown is not None and now - self.last_shown < self.min_interval:
+            self.dropped += 1  # Too soon after the last frame shown
+            return
+        self.last_shown = now
+        self._show(frame)
+
+    def close(self):
+        if self.thread is not None:
+            if self.thread.is_alive():
+                self._put(None)
+                self.thread.join()
+        elif self.last_shown is not None:
+            cv2.destroyWindow(self.window_name)
+
+
+def _helper_sink(sink, window_name):
+    # Sink of a framing helper as a context manager: an on-screen viewer created and closed by the helper if
+    # sink is None, otherwise the caller's sink, left open so that it can be reused (e.g. one VideoSink for
+    # several recordings)
+    return DisplaySink(window_name) if sink is None else contextlib.nullcontext(sink)
+
+
+def time_window_frames(e_x, e_y, e_ts, e_pol, height, width, window_period):
+    """
+    Bin events into consecutive fixed time windows.
+
+    Window k holds the events with k * window_period < ts <= (k + 1) * window_period, starting from
+    the window of the first event so that seeked recordings have no leading empty windows. The window
+    boundaries are found with a single searchsorted over the (sorted) timestamps and each window is
+    filled with one vectorized scatter instead of a per-event Python loop.
+
+    Args:
+        e_x, e_y (np.ndarray): x and y coordinates of the events.
+        e_ts (np.ndarray): Sorted timestamps, in the same unit as window_period.
+        e_pol (np.ndarray): Event polarity (1 for ON events, 0 for OFF events).
+        height, width (int): Sensor resolution.
+        window_period (float): Duration of each time window.
+
+    Yields:
+        window_pos, window_neg (np.ndarray): uint8 frames of ON and OFF events for each window.
+    """
+    e_ts = np.asarray(e_ts)
+    if len(e_ts) == 0:
+        return
+    on = np.asarray(e_pol) == 1
+
+    # End offset of every window: the first event with ts > (k + 1) * window_period
+    ends = np.searchsorted(e_ts, _window_edges(e_ts, window_period), side='right')
+
+    start = 0
+    for end in ends:
+        yield _window_frames(e_x[start:end], e_y[start:end], on[start:end], height, width)
+        start = end
+
+
+def _window_frames(x, y, on, height, width):
+    # uint8 frames of the ON and OFF events of one window, on is True for ON events
+    window_pos = np.zeros((height, width), dtype=np.uint8)
+    window_neg = np.zeros((height, width), dtype=np.uint8)
+    window_pos[y[on], x[on]] = 255  # Bright pixel for ON events
+    window_neg[y[~on], x[~on]] = 255  # Bright pixel for OFF events
+    return window_pos, window_neg
+
+
+def time_window(events, camera_events,height, width,window_period, sink=None):
+    # Wrap the 'x' and 'y' coordinates of events, their timestamps ('ts', in microseconds), and polarity ('pol')
+    stream = _as_stream(events, camera_events)
+    # One time window of events at a time, so that only the events of the current window are read and converted
+    frames = (_window_frames(chunk.x, chunk.y, chunk.pol == 1, height, width)
+              for chunk in stream.time_chunks(window_period * 10 ** 3))  # Window period in microseconds
 
     ### Binning Events for Fixed Time Window ###
-    time = window_period
-    # Create empty windows to store event data for positive and negative events
-    window_pos = np.zeros((height, width))
-    window_neg = np.zeros((height, width))
-
-    # Loop through all the events (x, y, timestamp, polarity)
-    for x, y, ts, pol in zip(e_x, e_y, e_ts, e_pol):
-        # Check if the event timestamp is within the current time window
-        if ts <= time:
-            # Set the pixel based on the polarity of the event
-            if pol == 1:
-                window_pos[y][x] = 255  # Bright pixel for ON events
-            else:
-                window_neg[y][x] = 255  # Bright pixel for OFF events
-        else:
-            # If the event is outside the window period, display the current window of events
-            cv2.imshow('Event Pos and Neg', np.hstack((window_pos, window_neg)))  # Show combined image
-            cv2.waitKey(1)  # Allow the plot to be displayed interactively
-
-            # Update the time for the next window
-            time += window_period
-            # Reset the windows for the next batch of events
-            window_pos.fill(0)
-            window_neg.fill(0)
-
-
-def sliding_window(events, camera_events, height, width, initial_window_period, sliding_wdw, time_buff):
-    # Extract event data (X, Y coordinates, timestamps, and polarity)
-    e_x = events['data'][camera_events]['dvs']['x']  # X-coordinates of events
-    e_y = events['data'][camera_events]['dvs']['y']  # Y-coordinates of events
-    e_ts = np.multiply(events['data'][camera_events]['dvs']['ts'], 10 ** 3)  # Convert timestamps to milliseconds
-    e_pol = events['data'][camera_events]['dvs']['pol']  # Event polarity (1 = ON, 0 = OFF)
-
-    # Initialize sliding window visualization arrays
-    sliding_window_pos = np.zeros((height, width), dtype=np.uint8)  # Stores ON events
-    sliding_window_neg = np.zeros((height, width), dtype=np.uint8)  # Stores OFF events
-    event_queue = deque()  # Queue to track events within the window
-
-    # Process the initial window of events
-    for x, y, ts, pol in zip(e_x, e_y, e_ts, e_pol):
-        if ts <= initial_window_period:
-            # Assign event polarity to the correct visualization matrix
-            if pol == 1:
-                sliding_window_pos[y][x] = 255  # Mark ON events in white
-            else:
-                sliding_window_neg[y][x] = 255  # Mark OFF events in white
-            event_queue.append((x, y, ts, pol))  # Store the event for future updates
-        else:
-            # Start processing sliding window updates
-            if ts <= initial_window_period + time_buff:
-                # Remove old events outside the sliding window
-                while event_queue and event_queue[0][2] < ts - initial_window_period:
-                    old_event = event_queue.popleft()
-                    x_old, y_old, ts_old, pol_old = old_event
-                    if pol_old == 1:
-                        sliding_window_pos[y_old][x_old] = 0  # Remove old ON event
-                    else:
-                        sliding_window_neg[y_old][x_old] = 0  # Remove old OFF event
-                # Add new event to visualization
-                if pol == 1:
-                    sliding_window_pos[y][x] = 255
-                else:
-                    sliding_window_neg[y][x] = 255
-                event_queue.append((x, y, ts, pol))  # Store event in queue
-            else:
-                # Update display and allow continuous visualization
-                cv2.imshow('Event Pos and Neg', np.hstack((sliding_window_pos, sliding_window_neg)))
-                cv2.waitKey(1)
-                time_buff += sliding_wdw  # Expand time buffer for next updates
-
-
-def number_events(events, camera_events, height, width, num_events):
-    # Extract the 'x' and 'y' coordinates of events, their timestamps ('ts'), and polarity ('pol')
-    e_x = events['data'][camera_events]['dvs']['x']  # x-coordinates of events
-    e_y = events['data'][camera_events]['dvs']['y']  # y-coordinates of events
-    e_ts = np.multiply(events['data'][camera_events]['dvs']['ts'], 10 ** 3)  # Convert timestamps to milliseconds
-    e_pol = events['data'][camera_events]['dvs']['pol']  # Event polarity (1 for ON events, 0 for OFF events)
+    # Send the windows to the sink, an on-screen viewer by default (closed at the end, a given sink is left open)
+    with _helper_sink(sink, 'Event Pos and Neg') as sink:
+        for window_pos, window_neg in frames:
+            sink.write(np.hstack((window_pos, window_neg)))  # Show combined image
+
+
+class SlidingWindowSurface:
+    """
+    Sliding window of events backed by a preallocated ring buffer and per-pixel counters.
+
+    Events are appended and expired in bulk. Every pixel keeps the number of events it holds in the
+    window, so a pixel is only cleared once all of its events have expired. The ON/OFF frames and
+    the time surface (latest timestamp per pixel) are updated in place and exposed as views.
+
+    Args:
+        height, width (int): Sensor resolution.
+        capacity (int): Initial number of events the ring buffer can hold, doubled when exceeded.
+    """
+
+    EVENT_DTYPE = np.dtype([('x', np.int16), ('y', np.int16), ('ts', np.float64), ('pol', np.int8)])
+
+    def __init__(self, height, width, capacity=2 ** 16):
+        self.buffer = np.empty(capacity, dtype=self.EVENT_DTYPE)  # Ring buffer of events in the window
+        self.head = 0  # Index of the oldest event in the ring buffer
+        self.size = 0  # Number of events in the window
+        self.counts = np.zeros((2, height, width), dtype=np.uint32)  # Events per pixel, indexed by polarity
+        self.frames = np.zeros((2, height, width), dtype=np.uint8)  # 255 where a pixel holds any event
+        self.time_surface = np.zeros((2, height, width), dtype=np.float64)  # Latest timestamp per pixel
+
+    @property
+    def window_pos(self):
+        return self.frames[1]  # ON events
+
+    @property
+    def window_neg(self):
+        return self.frames[0]  # OFF events
+
+    def _segments(self, start, count):
+        # Split 'count' ring buffer slots starting at 'start' into at most two contiguous slices
+        capacity = len(self.buffer)
+        first = min(count, capacity - start)
+        return [self.buffer[start:start + first], self.buffer[:count - first]]
+
+    def _grow(self, size):
+        capacity = len(self.buffer)
+        while capacity < size:
+            capacity *= 2
+        buffer = np.empty(capacity, dtype=self.EVENT_DTYPE)
+        buffer[:self.size] = np.concatenate(self._segments(self.head, self.size))
+        self.buffer, self.head = buffer, 0
+
+    def append(self, x, y, ts, pol):
+        """Add a chunk of events, sorted by timestamp and not older than the events already in the window."""
+        count = len(ts)
+        if count == 0:
+            return
+        if self.size + count > len(self.buffer):
+            self._grow(self.size + count)
+        pol = (np.asarray(pol) == 1).astype(np.int8)
+
+        tail = (self.head + self.size) % len(self.buffer)
+        start = 0
+        for segment in self._segments(tail, count):
+            end = start + len(segment)
+            segment['x'], segment['y'], segment['ts'], segment['pol'] = x[start:end], y[start:end], ts[start:end], pol[start:end]
+            start = end
+        self.size += count
+
+        np.add.at(self.counts, (pol, y, x), 1)
+        self.frames[pol, y, x] = 255
+        np.maximum.at(self.time_surface, (pol, y, x), ts)
+
+    def expire(self, t):
+        """Remove all the events with a timestamp older than t."""
+        expired = []
+        for segment in self._segments(self.head, self.size):
+            k = np.searchsorted(segment['ts'], t, side='left')
+            expired.append(segment[:k])
+            if k < len(segment):
+                break
+        expired = np.concatenate(expired) if len(expired) > 1 else expired[0]
+        if len(expired) == 0:
+            return
+        self.head = (self.head + len(expired)) % len(self.buffer)
+        self.size -= len(expired)
+
+        index = (expired['pol'], expired['y'], expired['x'])
+        np.subtract.at(self.counts, index, 1)
+        self.frames[index] = np.where(self.counts[index] > 0, 255, 0)  # Clear pixels with no events left
+
+
+def sliding_window_frames(e_x, e_y, e_ts, e_pol, height, width, window_period, sliding_wdw, time_buff=0):
+    """
+    Slide a window of length window_period over the events in steps of sliding_wdw.
+
+    Args:
+        e_x, e_y (np.ndarray): x and y coordinates of the events.
+        e_ts (np.ndarray): Sorted timestamps, in the same unit as window_period.
+        e_pol (np.ndarray): Event polarity (1 for ON events, 0 for OFF events).
+        height, width (int): Sensor resolution.
+        window_period (float): Length of the sliding window.
+        sliding_wdw (float): Time between two consecutive frames.
+        time_buff (float): Delay of the first frame after the initial window, which starts at the first event.
+
+    Yields:
+        window_pos, window_neg (np.ndarray): Views of the ON and OFF frames of the
+            SlidingWindowSurface, overwritten at the next step.
+    """
+    e_ts = np.asarray(e_ts)
+    if len(e_ts) == 0:
+        return
+
+    def read(start, t_end):
+        end = np.searchsorted(e_ts, t_end, side='right')
+        return (e_x[start:end], e_y[start:end], e_ts[start:end], e_pol[start:end]), end
+
+    yield from _slide(read, len(e_ts), e_ts[0], height, width, window_period, sliding_wdw, time_buff)
+
+
+def _slide(read, num_events, t_first, height, width, window_period, sliding_wdw, time_buff):
+    # Loop of the sliding window, read(start, t_end) returns the (x, y, ts, pol) events from offset start up to
+    # time t_end and the offset of the next event
+    surface = SlidingWindowSurface(height, width)
+    t_end = t_first + window_period + time_buff
+    start = 0
+    while start < num_events:
+        chunk, end = read(start, t_end)
+        surface.append(*chunk)  # Add new events
+        surface.expire(t_end - window_period)  # Remove old events outside the sliding window
+        yield surface.window_pos, surface.window_neg
+        t_end += sliding_wdw
+        start = end
+
+
+def sliding_window(events, camera_events, height, width, initial_window_period, sliding_wdw, time_buff, sink=None):
+    # Wrap event data (X, Y coordinates, timestamps in microseconds, and polarity)
+    stream = _as_stream(events, camera_events)
+
+    def read(start, t_end):
+        # Events up to t_end, found through the time index and converted one step at a time
+        end = max(stream.index.seek(t_end, side='right'), start)
+        chunk = stream[start:end]
+        return (chunk.x, chunk.y, chunk.ts, chunk.pol), end
+
+    frames = _slide(read, len(stream), stream.time_range[0] if len(stream) else 0, height, width,
+                    initial_window_period * 10 ** 3, sliding_wdw * 10 ** 3,
+                    time_buff * 10 ** 3)  # Window periods in microseconds
+
+    # Update display and allow continuous visualization, an on-screen viewer by default (closed at the end, a
+    # given sink is left open)
+    with _helper_sink(sink, 'Event Pos and Neg') as sink:
+        for sliding_window_pos, sliding_window_neg in frames:
+            sink.write(np.hstack((sliding_window_pos, sliding_window_neg)))
+
+
+def _pixel_indices(e_x, e_y, e_pol, height, width):
+    # Linear index (pol * height + y) * width + x of every event, pol 1 for ON events and 0 for OFF events
+    return (((np.asarray(e_pol) == 1) * height + np.asarray(e_y, dtype=np.int64)) * width
+            + np.asarray(e_x, dtype=np.int64))
+
+
+def number_events_frames(e_x, e_y, e_pol, height, width, num_events, stride=None, dtype=np.uint8, chunk_size=32):
+    """
+    Count events per pixel in windows of a fixed number of events.
+
+    Windows are binned chunk_size at a time: the linearized pixel indices (pol * height + y) * width + x
+    of the events covered by a chunk of windows are viewed as a (chunk_size, num_events) array without
+    copying, and binned with a single bincount. Only the events of the current chunk are converted, so
+    memory-mapped recordings are read as the frames are produced. Windows start every 'stride' events, so
+    a stride smaller than num_events gives overlapping windows. A last, partial window holds the events
+    not covered by a full one.
+
+    Args:
+        e_x, e_y (np.ndarray): x and y coordinates of the events.
+        e_pol (np.ndarray): Event polarity (1 for ON events, 0 for OFF events).
+        height, width (int): Sensor resolution.
+        num_events (int): Number of events per window.
+        stride (int): Number of events between the start of two windows, num_events by default.
+        dtype (np.dtype): Integer type of the frames, counts are clipped to its maximum.
+        chunk_size (int): Number of windows binned at once.
+
+    Yields:
+        frames (np.ndarray): Event counts of shape (chunk_size, 2, height, width), indexed by polarity
+            (0 for OFF events, 1 for ON events), the last chunk can be shorter.
+    """
+    stride = num_events if stride is None else stride
+    num_pixels = 2 * height * width
+    max_count = np.iinfo(dtype).max
+
+    def bin_windows(windows):
+        offsets = np.arange(len(windows))[:, np.newaxis] * num_pixels  # Separate windows in one bincount
+        counts = np.bincount((windows + offsets).ravel(), minlength=len(windows) * num_pixels)
+        return np.minimum(counts, max_count).astype(dtype).reshape(len(windows), 2, height, width)
+
+    num_total = len(e_x)
+    num_full = (num_total - num_events) // stride + 1 if num_total >= num_events else 0
+    for i in range(0, num_full, chunk_size):
+        # Events of windows i to i + chunk_size, then a zero-copy (chunk_size, num_events) view of the windows
+        start, stop = i * stride, (min(i + chunk_size, num_full) - 1) * stride + num_events
+        pixels = _pixel_indices(e_x[start:stop], e_y[start:stop], e_pol[start:stop], height, width)
+        yield bin_windows(np.lib.stride_tricks.sliding_window_view(pixels, num_events)[::stride])
+
+    rest = num_full * stride  # Leftover events, not covered by a full window
+    if rest < num_total and (num_full == 0 or rest - stride + num_events < num_total):
+        yield bin_windows(_pixel_indices(e_x[rest:], e_y[rest:], e_pol[rest:], height, width)[np.newaxis])
+
+
+def number_events(events, camera_events, height, width, num_events, sink=None, chunk_size=32):
+    # Wrap the 'x' and 'y' coordinates of events, their timestamps ('ts'), and polarity ('pol')
+    stream = _as_stream(events, camera_events)
 
     ### Binning Events for Fixed Event Count Window ###
-    # Create empty windows to store event data for positive and negative events
-    window_pos = np.zeros((height, width))
-    window_neg = np.zeros((height, width))
-
-    # Loop through events in batches of 'num_events'
-    for i in range(0, len(e_x), num_events):
-        # Reset the windows for the next batch of events
-        window_pos.fill(0)
-        window_neg.fill(0)
-
-        # Process the next 'num_events' events
-        for j in range(i, min(i + num_events, len(e_x))):
-            x, y, pol = e_x[j], e_y[j], e_pol[j]
-            if pol == 1:
-                window_pos[y][x] = 255  # Bright pixel for ON events
-            else:
-                window_neg[y][x] = 255  # Bright pixel for OFF events
-
-        # Display the current window of events
-        cv2.imshow('Event Pos and Neg', np.hstack((window_pos, window_neg)))
-        cv2.waitKey(1)  # Allow the plot to be displayed interactively
+    # Send the windows to the sink, an on-screen viewer by default (closed at the end, a given sink is left open)
+    with _helper_sink(sink, 'Event Pos and Neg') as sink:
+        for chunk in stream.count_chunks(num_events * chunk_size):  # chunk_size windows at a time
+            for frames in number_events_frames(chunk.x, chunk.y, chunk.pol, height, width, num_events,
+                                               chunk_size=chunk_size):
+                for window_neg, window_pos in frames:
+                    # Bright pixels where any event occurred
+                    sink.write(np.hstack((window_pos > 0, window_neg > 0)).astype(np.uint8) * 255)
+
+class EventConv2d(nn.Conv2d):
+    """
+    Conv2d that only processes the active (non-zero) input pixels of the sparse samples of a batch.
+
+    Each active pixel scatters its value times the kernel footprint into the output with index_add_,
+    so the cost grows with the number of events instead of the sensor area. The active pixels are
+    processed in chunks of at most max_contributions (pixel, kernel element, output channel) products,
+    which bounds the memory at any density. Every sample of the batch takes the sparse path when its
+    fraction of active pixels is at most density_threshold, the others go through the dense
+    convolution: in an attention pyramid only the raw level is that sparse, the upsampled levels
+    spread every event over many pixels. The dense convolution is also used for dilated, grouped or
+    non zero-padded convolutions.
+
+    Args:
+        density_threshold (float): Largest fraction of active input pixels using the sparse path, the
+            break-even point with the dense convolution is around 0.1-0.5% on CPU depending on the kernel size.
+        max_contributions (int): Largest number of products computed at once by the sparse path.
+        Other arguments are those of nn.Conv2d.
+    """
+
+    def __init__(self, *args, density_threshold=0.002, max_contributions=2 ** 20, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.density_threshold = density_threshold
+        self.max_contributions = max_contributions
+
+    def _sparse_supported(self):
+        return (self.dilation == (1, 1) and self.groups == 1 and self.padding_mode == 'zeros'
+                and not isinstance(self.padding, str))
+
+    def forward(self, input):
+        if not self._sparse_supported():
+            return super().forward(input)
+        unbatched = input.dim() == 3
+        batch = input.unsqueeze(0) if unbatched else input
+        # Samples sparse enough for the sparse path, counted without materialising the active pixels
+        sparse = torch.count_nonzero(batch.flatten(1), dim=1) <= self.density_threshold * batch[0].numel()
+        num_sparse = int(sparse.sum())
+        if num_sparse == 0:
+            return super().forward(input)
+        if num_sparse == len(batch):
+            output = self._sparse_forward(batch)
+        else:
+            dense = super().forward(batch[~sparse])
+            output = dense.new_empty((len(batch), *dense.shape[1:]))
+            output[~sparse] = dense
+            output[sparse] = self._sparse_forward(batch[sparse])
+        return output[0] if unbatched else output
+
+    def _sparse_forward(self, input):
+        batch, _, height, width = input.shape
+        out_ch, _, size_y, size_x = self.weight.shape
+        (stride_y, stride_x), (pad_y, pad_x) = self.stride, self.padding
+        out_h = (height + 2 * pad_y - size_y) // stride_y + 1
+        out_w = (width + 2 * pad_x - size_x) // stride_x + 1
+        u = torch.arange(size_y, device=input.device)
+        v = torch.arange(size_x, device=input.device)
+        channels = torch.arange(out_ch, device=input.device) * out_h * out_w
+
+        output = torch.zeros(batch * out_ch * out_h * out_w, dtype=torch.promote_types(input.dtype, self.weight.dtype),
+                             device=input.device)
+        active = input.nonzero()
+        chunk_size = max(self.max_contributions // (size_y * size_x * out_ch), 1)
+        for start in range(0, len(active), chunk_size):
+            n, c, p, q = active[start:start + chunk_size].unbind(1)
+            values = input[n, c, p, q]
+            # Output position reached by every (active pixel, kernel row, kernel column)
+            out_y = (p + pad_y)[:, None, None] - u[None, :, None]
+            out_x = (q + pad_x)[:, None, None] - v[None, None, :]
+            valid = ((out_y >= 0) & (out_y % stride_y == 0) & (out_y // stride_y < out_h)
+                     & (out_x >= 0) & (out_x % stride_x == 0) & (out_x // stride_x < out_w))
+            k, ky, kx = valid.nonzero().unbind(1)
+            contributions = values[k, None] * self.weight[:, c[k], ky, kx].T  # (footprint, out_ch)
+            pixels = (n[k] * out_ch * out_h * out_w + (out_y[k, ky, 0] // stride_y) * out_w
+                      + out_x[k, 0, kx] // stride_x)
+            output.index_add_(0, (pixels[:, None] + channels[None, :]).flatten(), contributions.flatten())
+        output = output.view(batch, out_ch, out_h, out_w)
+        if self.bias is not None:
+            output = output + self.bias.view(1, -1, 1, 1)
+        return output
+
 
 def net_def(filter, tau_mem, in_ch, out_ch, size_krn, device, stride):
     # define our single layer network and load the filters
+    # (the convolution switches to an event-sparse path when few pixels are active)
     net = nn.Sequential(
-        nn.Conv2d(in_ch, out_ch, (size_krn,size_krn),  stride=stride, bias=False),
+        EventConv2d(in_ch, out_ch, (size_krn,size_krn),  stride=stride, bias=False),
         sl.LIF(tau_mem),
     )
     net[0].weight.data = filter.unsqueeze(1).to(device)
@@ -139,7 +803,8 @@ def initialise_attention(device, ATTENTION_PARAMS):
     vm_kernels = VMkernels(
         ATTENTION_PARAMS['thetas'], ATTENTION_PARAMS['size_krn'],
         ATTENTION_PARAMS['rho'], ATTENTION_PARAMS['r0'], ATTENTION_PARAMS['thick'],
-        ATTENTION_PARAMS['offset'], ATTENTION_PARAMS['fltr_resize_perc']
+        ATTENTION_PARAMS['offset'], ATTENTION_PARAMS['fltr_resize_perc'],
+        cache_dir=ATTENTION_PARAMS.get('kernel_cache_dir')
     )
     net_attention = net_def(vm_kernels, ATTENTION_PARAMS['tau_mem'], ATTENTION_PARAMS['num_pyr'], ATTENTION_PARAMS['out_ch'],
                          ATTENTION_PARAMS['size_krn'], device, ATTENTION_PARAMS['stride'])
@@ -147,44 +812,66 @@ def initialise_attention(device, ATTENTION_PARAMS):
     return net_attention
 
 
-def VMkernels(thetas, size, rho, r0, thick, offset,fltr_resize_perc):
+def VMkernels(thetas, size, rho, r0, thick, offset,fltr_resize_perc, cache_dir=None):
     """
     Create a set of Von Mises filters with different orientations.
 
+    All the orientations are computed in one broadcasted vm_filter call. Filter banks are memoized
+    in-process on their parameters and, when cache_dir is given, saved there as .npy files so that
+    later processes and parameter sweeps load them instead of recomputing them.
+
     Args:
         thetas (np.ndarray): Array of angles in radians.
         size (int): Size of the filter.
         rho (float): Scale coefficient to control arc length.
         r0 (int): Radius shift from the center.
+        cache_dir (str): Folder of the on-disk kernel cache, disabled if None.
 
     Returns:
-        filters (list): List of Von Mises filters.
-    """
-    filters = []
-    for theta in thetas:
-        filter = vm_filter(theta, size, rho=rho, r0=r0, thick=thick, offset=offset)
-        filter = rescale(filter, fltr_resize_perc, anti_aliasing=False)
-        filters.append(filter)
-    filters = torch.tensor(np.stack(filters).astype(np.float32))
+        filters (torch.Tensor): Von Mises filters of shape (len(thetas), height, width).
+    """
+    filters = _vm_kernels_cached(tuple(np.asarray(thetas, dtype=np.float64).tolist()), size, rho, r0, thick,
+                                 tuple(offset), tuple(np.atleast_1d(fltr_resize_perc).tolist()), cache_dir)
+    return torch.tensor(filters)
+
+
+@lru_cache(maxsize=32)
+def _vm_kernels_cached(thetas, size, rho, r0, thick, offset, fltr_resize_perc, cache_dir):
+    # Arguments are hashable versions of the VMkernels ones, the returned array must not be modified
+    if cache_dir is not None:
+        key = repr((thetas, size, rho, r0, thick, offset, fltr_resize_perc)).encode()
+        path = os.path.join(cache_dir, 'vmkernels_' + hashlib.sha1(key).hexdigest() + '.npy')
+        if os.path.exists(path):
+            return np.load(path)
+
+    filters = vm_filter(np.array(thetas), size, rho=rho, r0=r0, thick=thick, offset=offset)
+    scale = fltr_resize_perc[0] if len(fltr_resize_perc) == 1 else fltr_resize_perc
+    filters = rescale(filters, scale, anti_aliasing=False, channel_axis=0).astype(np.float32)
+
+    if cache_dir is not None:
+        # Write through a temporary file of this process, so that parallel processes never load a truncated file
+        os.makedirs(cache_dir, exist_ok=True)
+        with open('%s.%d.tmp' % (path, os.getpid()), 'wb') as f:
+            np.save(f, filters)
+        os.replace(f.name, path)
     return filters
 
 
 def vm_filter(theta, scale, rho=0.1, r0=0, thick=0.5, offset=(0, 0)):
-    """Generate a Von Mises filter with r0 shifting and an offset."""
+    """Generate a Von Mises filter with r0 shifting and an offset, or one per angle if theta is an array."""
     height, width = scale, scale
-    vm = np.empty((height, width))
     offset_x, offset_y = offset
+    theta = np.asarray(theta, dtype=np.float64)[..., np.newaxis, np.newaxis]  # Broadcast angles over the grid
+    y, x = np.meshgrid(np.arange(height), np.arange(width), indexing='ij')
 
-    for x in range(width):
-        for y in range(height):
-            # Shift X and Y based on r0 and offset
-            X = (x - width / 2) + r0 * np.cos(theta) - offset_x * np.cos(theta)
-            Y = (height / 2 - y) + r0 * np.sin(theta) - offset_y * np.sin(theta)  # Inverted Y for correct orientation
-            r = np.sqrt(X**2 + Y**2)
-            angle = zero_2pi_tan(X, Y)
+    # Shift X and Y based on r0 and offset
+    X = (x - width / 2) + r0 * np.cos(theta) - offset_x * np.cos(theta)
+    Y = (height / 2 - y) + r0 * np.sin(theta) - offset_y * np.sin(theta)  # Inverted Y for correct orientation
+    r = np.sqrt(X**2 + Y**2)
+    angle = zero_2pi_tan(X, Y)
 
-            # Compute the Von Mises filter value
-            vm[y, x] = np.exp(thick*rho * r0 * np.cos(angle - theta)) / iv(0, r - r0)
+    # Compute the Von Mises filter value
+    vm = np.exp(thick*rho * r0 * np.cos(angle - theta)) / iv(0, r - r0)
     # normalise value between -1 and 1
     # vm = vm / np.max(vm)
     # vm = vm * 2 - 1
@@ -207,22 +894,209 @@ def zero_2pi_tan(x, y):
     return angle
 
 
-def run_attention(window, net, device, resolution, num_pyr):
-    # Create resized versions of the frames
-    resized_frames = [torchvision.transforms.Resize((int(resolution[0] / num_pyr), int(resolution[1] / num_pyr)))(
-        window) for pyr in range(1, num_pyr + 1)]
-
-    # Process frames in batches
-    batch_frames = torch.stack(
-        [torchvision.transforms.Resize((resolution[0], resolution[1]))(window) for window in resized_frames]).type(torch.float32)
-    batch_frames = batch_frames.to(device)  # Move to GPU if available
-    output_rot = net(batch_frames)
-    # Sum the outputs over rotations and scales
-    output_rot_sum = torch.sum(torch.sum(output_rot, dim=1, keepdim=True), dim=0, keepdim=True).type(torch.float32).cpu().detach()
-    salmap = torchvision.transforms.Resize((resolution[0], resolution[1]))(output_rot_sum).squeeze(0).squeeze(
-        0)
-    salmax_coords = np.unravel_index(torch.argmax(salmap).cpu().numpy(), salmap.shape)
+class AttentionPyramid:
+    """
+    Multi-scale copies of a window, convolved at their native scale by the attention network.
+
+    Level pyr (1 to num_pyr) is the window downsampled by a factor pyr with F.interpolate. Every
+    level is convolved at its own size, so the coarse levels cost a fraction of the first one and
+    their kernels cover a proportionally larger part of the window. The outputs are then upsampled
+    by their factor pyr and placed where they lie on the output of the first level, so that the LIF
+    state of the network has the same shape for all windows. Levels smaller than the kernels are
+    left out.
+
+    Args:
+        resolution (tuple): (height, width) of the windows.
+        num_pyr (int): Number of pyramid levels.
+        device (torch.device): Device of the levels.
+        kernel_size (tuple): (height, width) of the kernels of the convolution.
+    """
+
+    def __init__(self, resolution, num_pyr, device, kernel_size=(1, 1)):
+        self.resolution = (int(resolution[0]), int(resolution[1]))
+        self.kernel_size = (int(kernel_size[0]), int(kernel_size[1]))
+        self.sizes = [(int(resolution[0] / pyr), int(resolution[1] / pyr)) for pyr in range(1, num_pyr + 1)]
+        self.sizes = [size for size in self.sizes if size[0] >= kernel_size[0] and size[1] >= kernel_size[1]]
+        if not self.sizes:
+            raise ValueError('Kernels of size %s do not fit windows of size %s' % (self.kernel_size, self.resolution))
+        self.device = device
+
+    def __call__(self, conv, window):
+        """Convolution of the pyramid of a window, as a (num_pyr, out_channels, h, w) tensor."""
+        return self.batched(conv, window.reshape(1, 1, *self.resolution))[0]
+
+    def batched(self, conv, windows):
+        """
+        Convolution of the pyramids of T windows of shape (T, 1, height, width), as a
+        (T, num_pyr, out_channels, h, w) tensor, (h, w) being the output size of the first level.
+        """
+        windows = windows.to(self.device, torch.float32)
+        first = conv(windows)
+        outputs = first.new_zeros((first.shape[0], len(self.sizes), *first.shape[1:]))
+        outputs[:, 0] = first
+        for pyr, size in enumerate(self.sizes[1:], start=2):
+            level = F.interpolate(windows, size=size, mode='bilinear', align_corners=False, antialias=True)
+            output = conv(level)
+            output = F.interpolate(output, size=(pyr * output.shape[-2], pyr * output.shape[-1]), mode='bilinear',
+                                   align_corners=False)
+            # The valid convolution of a level drops (pyr - 1) * (kernel - 1) / 2 more pixels on each side
+            top, left = ((pyr - 1) * (k - 1) // 2 for k in self.kernel_size)
+            outputs[:, pyr - 1, :, top:top + output.shape[-2], left:left + output.shape[-1]] = output
+        return outputs
+
+
+class AttentionSession:
+    """
+    Attention over consecutive windows of events, reusing the same buffers for every window.
+
+    The session owns the attention network, its pyramid and the window tensor. Since the batch
+    shape never changes, the LIF membrane state of the network carries over from one window to the
+    next. Only the event coordinates are sent to the device (through a pinned buffer on CUDA) and
+    only the index of the maximum is copied back.
+
+    Args:
+        device (torch.device): Device running the network.
+        ATTENTION_PARAMS (dict): Attention parameters, as for initialise_attention.
+        resolution (tuple): (height, width) of the windows.
+    """
+
+    def __init__(self, device, ATTENTION_PARAMS, resolution):
+        self.device = device
+        self.resolution = (int(resolution[0]), int(resolution[1]))
+        self.net = initialise_attention(device, ATTENTION_PARAMS)
+        self.pyramid = AttentionPyramid(self.resolution, ATTENTION_PARAMS['num_pyr'], device,
+                                        kernel_size=self.net[0].weight.shape[-2:])
+        self.window = torch.zeros((1, *self.resolution), dtype=torch.float32, device=device)
+        self.salmap = torch.zeros(self.resolution, dtype=torch.float32, device=device)
+        self._pin = device.type == 'cuda'
+        self._pixels = torch.empty(2 ** 16, dtype=torch.int64, pin_memory=self._pin)  # Staging buffer of pixel indices
+
+    def _upload(self, pixels):
+        # Copy the linear pixel indices to the device through the (pinned) staging buffer
+        if len(pixels) > len(self._pixels):
+            self._pixels = torch.empty(2 ** int(np.ceil(np.log2(len(pixels)))), dtype=torch.int64, pin_memory=self._pin)
+        staging = self._pixels[:len(pixels)]
+        staging.numpy()[:] = pixels
+        return staging.to(self.device, non_blocking=self._pin)
+
+    def step(self, events_chunk, values=None):
+        """
+        Run the attention on one window of events.
+
+        Args:
+            events_chunk (EventStream): Events of the window (any object with x and y arrays).
+            values (np.ndarray): Value of every event, summed over the events of a pixel. Pixels of
+                the events are set to 255 if None.
+
+        Returns:
+            salmap (torch.Tensor): Saliency map on the device, overwritten at the next step.
+            salmax_coords (tuple): (row, column) of the maximum of the saliency map.
+        """
+        self.window.zero_()
+        pixels = np.asarray(events_chunk.y, dtype=np.int64) * self.resolution[1] + np.asarray(events_chunk.x)
+        if len(pixels) and values is None:
+            self.window.view(-1)[self._upload(pixels)] = 255  # Mark the pixels of the events
+        elif len(pixels):
+            values = torch.as_tensor(np.asarray(values, dtype=np.float32)).to(self.device)
+            self.window.view(-1).index_put_((self._upload(pixels),), values, accumulate=True)
+
+        with torch.no_grad():
+            output_rot = self.net[1](self.pyramid(self.net[0], self.window))
+            # Sum the outputs over rotations and scales, and upsample only the summed map
+            output_rot_sum = output_rot.sum(dim=(0, 1), keepdim=True)
+            self.salmap.copy_(F.interpolate(output_rot_sum, size=self.resolution, mode='bilinear',
+                                            align_corners=False)[0, 0])
+        salmax_coords = divmod(torch.argmax(self.salmap).item(), self.resolution[1])
+        return self.salmap, salmax_coords
+
+    def step_batch(self, events_chunks):
+        """
+        Run the attention on T consecutive windows of events at once.
+
+        The T pyramids go through the convolution as one batch. The LIF layer treats the rotations of
+        a window as time steps, so the T windows are concatenated along the time dimension, which
+        gives the same membrane dynamics as T calls to step.
+
+        Args:
+            events_chunks (list): Events of the T windows (EventStream chunks).
+
+        Returns:
+            salmaps (torch.Tensor): Saliency maps of shape (T, height, width) on the device.
+            salmax_coords (np.ndarray): (T, 2) array of the (row, column) maxima.
+        """
+        num_windows = len(events_chunks)
+        height, width = self.resolution
+        pixels = np.concatenate([t * height * width + np.asarray(chunk.y, dtype=np.int64) * width + np.asarray(chunk.x)
+                                 for t, chunk in enumerate(events_chunks)])
+        windows = torch.zeros((num_windows, 1, height, width), dtype=torch.float32, device=self.device)
+        if len(pixels):
+            windows.view(-1)[self._upload(pixels)] = 255  # Mark the pixels of the events of every window
+
+        with torch.no_grad():
+            output_rot = self.pyramid.batched(self.net[0], windows)
+            num_pyr, num_rot, *size = output_rot.shape[1:]
+            # (T, num_pyr, rotations, ...) -> (num_pyr, T * rotations, ...), time-major for the LIF layer
+            output_rot = output_rot.transpose(0, 1)
+            output_rot = self.net[1](output_rot.reshape(num_pyr, num_windows * num_rot, *size))
+            # Sum the outputs over rotations and scales, and upsample only the summed maps
+            output_rot_sum = output_rot.view(num_pyr, num_windows, num_rot, *size).sum(dim=(0, 2))
+            salmaps = F.interpolate(output_rot_sum.unsqueeze(1), size=self.resolution, mode='bilinear',
+                                    align_corners=False)[:, 0]
+        maxima = torch.argmax(salmaps.view(num_windows, -1), dim=1).cpu().numpy()
+        return salmaps, np.stack(np.divmod(maxima, width), axis=1)
+
+    def reset(self):
+        """Reset the membrane state of the network."""
+        self.net[1].reset_states()
+
+
+def offline_attention(events, device, ATTENTION_PARAMS, window_period, resolution=None, batch_windows=32):
+    """
+    Saliency maps of a whole recording, computed batch_windows time windows at a time.
+
+    Args:
+        events (EventStream): Recording to process.
+        device (torch.device): Device running the network.
+        ATTENTION_PARAMS (dict): Attention parameters, as for initialise_attention.
+        window_period (int): Duration of a time window in microseconds.
+        resolution (tuple): (height, width) of the windows, the resolution of the events if None.
+        batch_windows (int): Number of windows processed in one batch.
+
+    Returns:
+        salmaps (torch.Tensor): Saliency maps of shape (T, height, width), on the CPU.
+        salmax_coords (np.ndarray): (T, 2) array of the (row, column) maxima.
+    """
+    session = AttentionSession(device, ATTENTION_PARAMS, resolution or events.resolution)
+    salmaps, salmax_coords, batch = [], [], []
+    chunks = events.time_chunks(window_period)
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) == batch_windows:
+            salmap, coords = session.step_batch(batch)
+            salmaps.append(salmap.cpu())
+            salmax_coords.append(coords)
+            batch = []
+    if batch:
+        salmap, coords = session.step_batch(batch)
+        salmaps.append(salmap.cpu())
+        salmax_coords.append(coords)
+    if not salmaps:
+        return torch.zeros((0, *session.resolution)), np.zeros((0, 2), dtype=np.int64)
+    return torch.cat(salmaps), np.concatenate(salmax_coords)
+
+
+def run_attention(window, net, device, resolution, num_pyr, pyramid=None):
+    # Convolve resized versions of the frames at their native scale
+    if pyramid is None:
+        pyramid = AttentionPyramid(resolution, num_pyr, device, kernel_size=net[0].weight.shape[-2:])
+
+    with torch.no_grad():  # Inference only, no autograd graph
+        output_rot = net[1](pyramid(net[0], window))
+        # Sum the outputs over rotations and scales, and upsample only the summed map
+        output_rot_sum = output_rot.sum(dim=(0, 1), keepdim=True).type(torch.float32)
+        salmap = F.interpolate(output_rot_sum, size=pyramid.resolution, mode='bilinear', align_corners=False)[0, 0]
+    salmax_coords = np.unravel_index(torch.argmax(salmap).item(), salmap.shape)
     # normalise salmap for visualization
-    salmap = salmap.detach().cpu().numpy()
+    salmap = salmap.cpu().numpy()
     salmap = np.array((salmap - salmap.min()) / (salmap.max() - salmap.min()) * 255)
-    return salmap,salmax_coords
\ No newline at end of file
+    return salmap,salmax_coords
@@ -0,0 +1,210 @@
+import numpy as np
+import torch
+
+
+class EventDrivenLIF:
+    """
+    Population of Leaky Integrate-and-Fire neurons updated only when they receive input.
+
+    The membrane potentials and the time of the last update of every neuron live in two contiguous
+    tensors. When a neuron receives an input at time t, its potential is first decayed in closed
+    form, v *= exp(-(t - t_last) / tau_mem), then the input is added and the neuron spikes as the
+    sinabs LIF layer does (multiple spikes, reset by subtraction). The cost of an input is therefore
+    independent of the size of the population.
+
+    Args:
+        num_neurons (int): Number of neurons.
+        tau_mem (float or torch.Tensor): Membrane time constant, in time steps, shared or per neuron.
+        spike_threshold (float): Membrane potential at which a neuron spikes.
+        norm_input (bool): Scale the inputs by (1 - exp(-1 / tau_mem)), as sinabs LIF does by default.
+        device (torch.device): Device of the state tensors.
+    """
+
+    def __init__(self, num_neurons, tau_mem, spike_threshold=1.0, norm_input=True, device='cpu'):
+        self.num_neurons = num_neurons
+        self.tau_mem = torch.as_tensor(tau_mem, dtype=torch.float32, device=device).expand(num_neurons)
+        self.spike_threshold = spike_threshold
+        self.input_scale = 1 - torch.exp(-1.0 / self.tau_mem) if norm_input else torch.ones_like(self.tau_mem)
+        self.v_mem = torch.zeros(num_neurons, dtype=torch.float32, device=device)
+        self.last_t = torch.zeros(num_neurons, dtype=torch.float32, device=device)
+
+    def reset_states(self):
+        self.v_mem.zero_()
+        self.last_t.zero_()
+
+    def __call__(self, neuron_ids, t, weights, record=False, scan_neurons=8):
+        """
+        Feed a batch of inputs, sorted by time, to the population.
+
+        Inputs to different neurons are independent, so the batch is processed in rounds where every
+        neuron receives at most one input: round k holds the k-th input of every neuron. The inputs are
+        sorted by round once, so each round is a contiguous slice and a handful of vectorized
+        operations on the neurons it touches. Once a round touches at most scan_neurons neurons (the
+        few hot neurons with many inputs, e.g. large peripheral RFs), their remaining inputs are
+        scanned one by one on the CPU instead, where an input costs far less than a round.
+
+        Args:
+            neuron_ids (array-like): Target neuron of every input.
+            t (array-like): Time of every input, in time steps, sorted.
+            weights (array-like): Value of every input.
+            record (bool): Also return the membrane potential of the target neuron after every input.
+            scan_neurons (int): Largest number of neurons of a round from which the remaining inputs are scanned.
+
+        Returns:
+            spike_ids (torch.Tensor): Neurons that spiked, sorted by spike time.
+            spike_ts (torch.Tensor): Time of the spikes.
+            spike_counts (torch.Tensor): Number of spikes emitted at once (multiple spikes).
+            v_mem (torch.Tensor): Membrane potential after every input, only if record is True.
+        """
+        device = self.v_mem.device
+        neuron_ids = torch.as_tensor(np.asarray(neuron_ids), dtype=torch.int64, device=device)
+        t = torch.as_tensor(np.asarray(t), dtype=torch.float32, device=device).expand(neuron_ids.shape)
+        weights = torch.as_tensor(np.asarray(weights), dtype=torch.float32, device=device).expand(neuron_ids.shape)
+
+        # Rank of every input among the inputs of its neuron (stable sort keeps the time order)
+        sorted_ids, order = torch.sort(neuron_ids, stable=True)
+        _, counts = torch.unique_consecutive(sorted_ids, return_counts=True)
+        starts = torch.repeat_interleave(torch.cumsum(counts, 0) - counts, counts)
+        rank = torch.empty_like(order)
+        rank[order] = torch.arange(len(order), device=device) - starts
+
+        # Inputs grouped by rank, in time order: round k is the contiguous slice of the k-th inputs of all the neurons
+        by_rank = torch.sort(rank, stable=True).indices
+        bounds = torch.cumsum(torch.bincount(rank), 0).tolist() if len(rank) else []
+
+        spikes = []
+        v_after = torch.empty(len(neuron_ids), dtype=torch.float32, device=device) if record else None
+        start = 0
+        for end in bounds:
+            if end - start <= scan_neurons:
+                # Only a few neurons left: scan all their remaining inputs, in time order for every neuron
+                spikes.append(self._scan(by_rank[start:], neuron_ids, t, weights, v_after))
+                break
+            inputs = by_rank[start:end]
+            start = end
+            ids, t_in = neuron_ids[inputs], t[inputs]
+
+            # Lazy closed-form decay since the last update, then integrate the input
+            v = self.v_mem[ids] * torch.exp(-(t_in - self.last_t[ids]) / self.tau_mem[ids])
+            v = v + self.input_scale[ids] * weights[inputs]
+            num_spikes = torch.clamp(torch.floor(v / self.spike_threshold), min=0)
+            v = v - num_spikes * self.spike_threshold  # Reset by subtraction
+
+            self.v_mem[ids] = v
+            self.last_t[ids] = t_in
+            if record:
+                v_after[inputs] = v
+            fired = num_spikes > 0
+            spikes.append((ids[fired], t_in[fired], num_spikes[fired]))
+
+        if spikes:
+            spike_ids, spike_ts, spike_counts = (torch.cat(values) for values in zip(*spikes))
+            order = torch.sort(spike_ts, stable=True).indices
+            spike_ids, spike_ts, spike_counts = spike_ids[order], spike_ts[order], spike_counts[order]
+        else:
+            spike_ids = torch.zeros(0, dtype=torch.int64, device=device)
+            spike_ts = spike_counts = torch.zeros(0, dtype=torch.float32, device=device)
+        if record:
+            return spike_ids, spike_ts, spike_counts, v_after
+        return spike_ids, spike_ts, spike_counts
+
+    def _scan(self, inputs, neuron_ids, t, weights, v_after):
+        # Integrate the inputs one by one. The decays do not depend on the potential, so they are computed
+        # beforehand with the same float32 operations as a round, the loop only adds, floors and subtracts
+        inputs = inputs[torch.sort(neuron_ids[inputs], stable=True).indices]  # Grouped by neuron, in time order
+        ids, t_in = neuron_ids[inputs], t[inputs]
+        first = torch.ones_like(ids, dtype=torch.bool)  # First input of every neuron in the scan
+        first[1:] = ids[1:] != ids[:-1]
+        t_prev = torch.where(first, self.last_t[ids], t_in.roll(1))
+        decay = torch.exp(-(t_in - t_prev) / self.tau_mem[ids]).cpu().numpy()
+        scaled = (self.input_scale[ids] * weights[inputs]).cpu().numpy()
+        v_start, is_first = self.v_mem[ids].cpu().numpy(), first.cpu().numpy()
+
+        threshold = np.float32(self.spike_threshold)
+        v_out = np.empty(len(inputs), dtype=np.float32)
+        num_spikes = np.zeros(len(inputs), dtype=np.float32)
+        v = np.float32(0)
+        for i in range(len(inputs)):
+            v = (v_start[i] if is_first[i] else v) * decay[i] + scaled[i]
+            num_spikes[i] = max(np.floor(v / threshold), 0)
+            v = v_out[i] = v - num_spikes[i] * threshold  # Reset by subtraction
+
+        device = self.v_mem.device
+        v_out, num_spikes = torch.as_tensor(v_out, device=device), torch.as_tensor(num_spikes, device=device)
+        last = first.roll(-1)  # Last input of every neuron
+        self.v_mem[ids[last]] = v_out[last]
+        self.last_t[ids[last]] = t_in[last]
+        if v_after is not None:
+            v_after[inputs] = v_out
+        fired = num_spikes > 0
+        return ids[fired], t_in[fired], num_spikes[fired]
+
+
+def simulate_lif_population(I_ext, dt, Cm, gL, VL, VT, VR, t_ref=0.0, method='euler', record=False):
+    """
+    Simulate a population of independent Leaky Integrate-and-Fire neurons, as in Tutorial3-Neuron.
+
+    All the neurons advance together, one time step per iteration. The parameters are scalars or
+    (N,) arrays, so a sweep over Cm, gL, VT or the input current is a single population. A neuron
+    crossing VT is shown at the spike peak VT + 5 for that step, then held at VR for the refractory
+    period (at least one step) before integrating again.
+
+    Args:
+        I_ext (np.ndarray): Input current, (T,) shared by all neurons or (T, N).
+        dt (float): Time step (ms).
+        Cm, gL, VL, VT, VR (float or np.ndarray): Membrane capacitance (uF), leak conductance (mS),
+            resting, threshold and reset potentials (mV), shared or per neuron.
+        t_ref (float or np.ndarray): Refractory period (ms).
+        method (str): 'euler' for the forward Euler step of Tutorial3-Neuron, 'exact' for the exact
+            exponential solution with the input constant over each step.
+        record (bool): Also return the membrane potential of every neuron at every step.
+
+    Returns:
+        spike_ids (np.ndarray): Neurons that spiked, sorted by spike time.
+        spike_times (np.ndarray): Time of the spikes (ms).
+        V (np.ndarray): (T, N) membrane potentials, only if record is True.
+    """
+    if method not in ('euler', 'exact'):
+        raise ValueError('Unknown integration method: %s' % method)
+    I_ext = np.asarray(I_ext, dtype=np.float64)
+    # Broadcast the parameters and the input current to (N,) arrays
+    params = np.broadcast_arrays(Cm, gL, VL, VT, VR, t_ref, np.zeros(I_ext.shape[1:]))
+    Cm, gL, VL, VT, VR, t_ref = (np.asarray(p, dtype=np.float64).ravel() for p in params[:-1])
+    num_steps, num_neurons = I_ext.shape[0], len(VL)
+    I_ext = np.broadcast_to(I_ext.reshape(num_steps, -1), (num_steps, num_neurons))
+
+    Rm = 1 / gL  # Membrane resistance (MΩ)
+    tau_m = Cm / gL  # Membrane time constant (ms)
+    decay = np.exp(-dt / tau_m)
+    ref_steps = np.maximum(np.round(t_ref / dt), 1).astype(np.int64)  # Steps held at VR after a spike
+
+    V = VL.copy()  # Membrane potential, starting at rest
+    refractory = np.zeros(num_neurons, dtype=np.int64)  # Remaining refractory steps
+    trace = np.empty((num_steps, num_neurons)) if record else None
+    if record:
+        trace[0] = V
+    spike_ids, spike_steps = [], []
+    for i in range(1, num_steps):
+        if method == 'exact':
+            V_inf = VL + Rm * I_ext[i]  # Steady state potential for the current input
+            V_next = V_inf + (V - V_inf) * decay
+        else:
+            V_next = V + ((VL - V) + Rm * I_ext[i]) / tau_m * dt  # Euler's method
+        held = refractory > 0
+        V = np.where(held, VR, V_next)
+        refractory[held] -= 1
+
+        spiking = np.flatnonzero(V >= VT)
+        refractory[spiking] = ref_steps[spiking]
+        spike_ids.append(spiking)
+        spike_steps.append(np.full(len(spiking), i))
+        if record:
+            trace[i] = V
+            trace[i, spiking] = VT[spiking] + 5  # Spike peak
+        V[spiking] = VR[spiking]  # Reset potential after spike
+
+    spike_ids = np.concatenate(spike_ids) if spike_ids else np.zeros(0, dtype=np.int64)
+    spike_times = np.concatenate(spike_steps) * dt if spike_steps else np.zeros(0)
+    if record:
+        return spike_ids, spike_times, trace
+    return spike_ids, spike_times
@@ -0,0 +1,199 @@
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+import sinabs.layers as sl
+from helpers.helpers import EventConv2d
+
+
+def gaussian_kernel(size, sigma):
+    """Gaussian kernel of shape (size, size), min-max normalised to [0, 1]."""
+    x = torch.linspace(-size // 2, size // 2, size)
+    y = torch.linspace(-size // 2, size // 2, size)
+    x, y = torch.meshgrid(x, y, indexing='ij')  # Create coordinate grid
+    kernel = torch.exp(-(x ** 2 + y ** 2) / (2 * sigma ** 2))  # Compute Gaussian function
+    kernel = (kernel - kernel.min()) / (kernel.max() - kernel.min())  # Normalize kernel values
+    return kernel
+
+
+def OMSkernels(size_krn_center, sigma_center, size_krn_surround, sigma_surround):
+    """Gaussian kernels of the center and surround regions, each of shape (1, size, size)."""
+    center = gaussian_kernel(size_krn_center, sigma_center).unsqueeze(0)  # Create center kernel
+    surround = gaussian_kernel(size_krn_surround, sigma_surround).unsqueeze(0)  # Create surround kernel
+    return center, surround
+
+
+# Kernel sizes from which the separable and FFT backends are faster than the dense convolution (measured on CPU)
+SEPARABLE_MIN_SIZE = 16
+FFT_MIN_SIZE = 32
+
+
+def oms_conv(weight, stride=1, backend='auto'):
+    """
+    Convolution module with fixed kernels, for large kernels without a cost proportional to their area.
+
+    Args:
+        weight (torch.Tensor): Kernels of shape (out_ch, 1, size, size).
+        stride (int): Stride of the convolution.
+        backend (str): 'dense' (EventConv2d), 'separable' (SeparableConv2d), 'fft' (FFTConv2d) or
+            'auto' to choose by kernel size.
+
+    Returns:
+        conv (nn.Module): Convolution without bias, without padding.
+    """
+    size = weight.shape[-1]
+    if backend == 'auto':
+        backend = 'dense' if size < SEPARABLE_MIN_SIZE else 'separable' if size < FFT_MIN_SIZE else 'fft'
+    if backend == 'separable':
+        return SeparableConv2d(weight, stride)
+    if backend == 'fft':
+        return FFTConv2d(weight, stride)
+    if backend != 'dense':
+        raise ValueError('Unknown convolution backend: %s' % backend)
+    conv = EventConv2d(1, weight.shape[0], (size, size), stride=stride, bias=False)
+    conv.weight.data = weight.float()
+    return conv
+
+
+class SeparableConv2d(nn.Module):
+    """
+    Convolution with low-rank kernels as sums of a vertical and a horizontal 1D convolution.
+
+    The kernels are decomposed by SVD and the singular values below tol (relative to the largest one)
+    are dropped. A Gaussian is rank 1 and the min-max normalised gaussian_kernel rank 2 (a Gaussian
+    minus a constant), so they are reproduced up to floating point rounding at the cost of
+    2 * rank * size operations per pixel instead of size ** 2.
+
+    Args:
+        weight (torch.Tensor): Kernels of shape (out_ch, 1, size, size).
+        stride (int): Stride of the convolution.
+        tol (float): Relative threshold of the singular values kept.
+    """
+
+    def __init__(self, weight, stride=1, tol=1e-6):
+        super().__init__()
+        U, S, Vh = torch.linalg.svd(weight[:, 0].double())
+        self.rank = max(int((S > tol * S[:, :1]).sum(dim=1).max()), 1)
+        self.out_ch, self.stride = weight.shape[0], stride
+        root = S[:, :self.rank].sqrt()
+        vertical = U[:, :, :self.rank] * root[:, None, :]  # (out_ch, size, rank)
+        horizontal = Vh[:, :self.rank, :] * root[:, :, None]  # (out_ch, rank, size)
+        self.register_buffer('vertical', vertical.permute(0, 2, 1).reshape(-1, 1, weight.shape[-2], 1).float())
+        self.register_buffer('horizontal', horizontal.reshape(-1, 1, 1, weight.shape[-1]).float())
+
+    def forward(self, input):
+        output = F.conv2d(input, self.vertical, stride=(self.stride, 1))
+        output = F.conv2d(output, self.horizontal, stride=(1, self.stride), groups=self.out_ch * self.rank)
+        return output.view(input.shape[0], self.out_ch, self.rank, *output.shape[2:]).sum(dim=2)
+
+
+class FFTConv2d(nn.Module):
+    """
+    Convolution computed as a product of spectra, with a cost independent of the kernel size.
+
+    The input and the kernels are transformed at the input size: the circular wrap-around only
+    reaches the first size - 1 rows and columns, which are outside the valid convolution anyway.
+    The kernel spectra are computed once per input size.
+
+    Args:
+        weight (torch.Tensor): Kernels of shape (out_ch, 1, size, size).
+        stride (int): Stride of the convolution.
+    """
+
+    def __init__(self, weight, stride=1):
+        super().__init__()
+        self.register_buffer('weight', weight.float().flip(-2, -1))  # Flipped: conv2d is a correlation
+        self.stride = stride
+        self._spectra = {}
+
+    def forward(self, input):
+        height, width = input.shape[-2:]
+        size_y, size_x = self.weight.shape[-2:]
+        key = (height, width, input.device)
+        if key not in self._spectra:
+            self._spectra[key] = torch.fft.rfft2(self.weight[:, 0].to(input.device), s=(height, width))
+        spectrum = torch.fft.rfft2(input, s=(height, width)) * self._spectra[key]  # (N, out_ch, ...)
+        output = torch.fft.irfft2(spectrum, s=(height, width))
+        return output[..., size_y - 1::self.stride, size_x - 1::self.stride]
+
+
+class FusedOMS:
+    """
+    Object Motion Sensitivity (OMS) network with fused center and surround paths.
+
+    The center and surround kernels are the two output channels of a single convolution (the smaller
+    kernel is zero-padded to the size of the larger one), followed by a single LIF layer where the
+    two channels are the batch. The outputs are normalised and thresholded into preallocated buffers.
+
+    The LIF layer treats the rows of a frame as time steps, as the separate center and surround
+    networks of Tutorial7 do on a single frame. A batch of T frames is therefore laid out time-major,
+    as (2, T * rows, columns), which gives the same membrane dynamics as T calls with one frame.
+
+    The convolution backend is chosen by oms_conv from OMS_PARAMS['conv_backend'] (default 'auto').
+
+    Args:
+        device (torch.device): Device running the network.
+        OMS_PARAMS (dict): OMS parameters, as in Tutorial7.
+    """
+
+    def __init__(self, device, OMS_PARAMS):
+        if OMS_PARAMS['sc'] != OMS_PARAMS['ss']:
+            raise ValueError('The center and surround strides must be equal to fuse the convolutions')
+        self.device = device
+        self.threshold = OMS_PARAMS['threshold']
+        center, surround = OMSkernels(OMS_PARAMS['size_krn_center'], OMS_PARAMS['sigma_center'],
+                                      OMS_PARAMS['size_krn_surround'], OMS_PARAMS['sigma_surround'])
+        size = max(OMS_PARAMS['size_krn_center'], OMS_PARAMS['size_krn_surround'])
+        kernels = torch.cat([_pad_kernel(center, size), _pad_kernel(surround, size)])  # (2, size, size)
+
+        self.conv = oms_conv(kernels.unsqueeze(1), OMS_PARAMS['sc'], OMS_PARAMS.get('conv_backend', 'auto')).to(device)
+        self.lif = sl.LIF(OMS_PARAMS['tau_memOMS']).to(device)
+        self._buffers = None
+
+    def _buffers_for(self, shape):
+        # Reuse the output buffers while the batch shape does not change
+        if self._buffers is None or self._buffers[0].shape != shape:
+            self._buffers = (torch.empty(shape, device=self.device),  # Normalised difference
+                             torch.empty(shape, dtype=torch.bool, device=self.device),  # Thresholded pixels
+                             torch.empty(shape, device=self.device))  # OMS map
+        return self._buffers
+
+    def __call__(self, frames):
+        """
+        Run the OMS on a batch of frames.
+
+        Args:
+            frames (torch.Tensor): Frames of shape (T, 1, height, width) (or (T, height, width)).
+
+        Returns:
+            OMS (torch.Tensor): (T, height', width') maps, 255 where the normalised center-surround
+                difference is above threshold. The buffer is overwritten at the next call.
+            indexes (torch.Tensor): (T, height', width') boolean map of the thresholded pixels, also reused.
+        """
+        frames = frames.float().to(self.device)
+        if frames.dim() == 3:
+            frames = frames.unsqueeze(1)
+        num_frames = frames.shape[0]
+        with torch.no_grad():
+            output = self.conv(frames)  # (T, 2, height', width')
+            rows, cols = output.shape[2:]
+            # (T, 2, rows, cols) -> (2, T * rows, cols): the channels are the batch, the rows of the frames the time
+            output = self.lif(output.transpose(0, 1).reshape(2, num_frames * rows, cols)).view(2, num_frames, rows, cols)
+
+            events, indexes, OMS = self._buffers_for((num_frames, rows, cols))
+            torch.sub(output[0], output[1], out=events)  # Compute event difference
+            low = events.amin(dim=(1, 2), keepdim=True)
+            high = events.amax(dim=(1, 2), keepdim=True)
+            events.sub_(low).div_(high - low).neg_().add_(1)  # Normalize the events of every frame
+            torch.ge(events, self.threshold, out=indexes)  # Apply thresholding
+            OMS.zero_().masked_fill_(indexes, 255)
+        return OMS, indexes
+
+    def reset(self):
+        """Reset the membrane state of the network."""
+        self.lif.reset_states()
+
+
+def _pad_kernel(kernel, size):
+    # Zero-pad a (1, k, k) kernel to (1, size, size), keeping it centred
+    pad = size - kernel.shape[-1]
+    return F.pad(kernel, (pad // 2, pad - pad // 2, pad // 2, pad - pad // 2))
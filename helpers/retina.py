@@ -0,0 +1,430 @@
+import os
+import json
+import hashlib
+from functools import lru_cache
+
+import numpy as np
+import scipy.sparse as sp
+from helpers.helpers import EventStream, AttentionSession
+
+
+def eccentric_rf_geometry(a, rho0, R, S, width, height):
+    """
+    Compute the receptive fields (RFs) of a log-polar retina.
+
+    Ring r (1 to R) lies at eccentricity rho = rho0 * a ** r, rescaled to fit the sensor, and holds S
+    RFs evenly spaced in angle. RFs whose centre falls outside the sensor are skipped, the others are
+    numbered ring by ring as in Tutorial6.
+
+    Args:
+        a (float): Nonlinearity parameter of the log-polar mapping.
+        rho0 (float): Blind spot radius.
+        R (int): Number of eccentricity rings.
+        S (int): Number of angular sectors.
+        width, height (int): Sensor resolution.
+
+    Returns:
+        geometry (dict): Arrays with one entry per RF: 'cx', 'cy' (float centres), 'x', 'y' (integer
+            centres), 'radius' (integer radius), 'R' (ring) and 'S' (sector).
+    """
+    # Maximum receptive field size (Equation 4) and maximum rho value fitting the sensor
+    W_max = rho0 * (a ** R) * (1 - a ** (-1))
+    max_rho = np.sqrt((width / 2) ** 2 + (height / 2) ** 2)
+
+    ring, sector = np.meshgrid(np.arange(1, R + 1), np.arange(S), indexing='ij')
+    ring, sector = ring.ravel(), sector.ravel()
+    rho = rho0 * (a ** ring.astype(np.float64))  # Eccentricity of every ring
+    rescaled_rho = (rho / (rho0 * a ** R)) * max_rho
+    psi = 2 * np.pi * sector / S  # Angular displacement in polar coordinates
+    cx = rescaled_rho * np.cos(psi) + width // 2
+    cy = rescaled_rho * np.sin(psi) + height // 2
+
+    # No receptive fields inside the blind spot, the RF size grows with eccentricity
+    radius = np.where(rho < rho0, 0, W_max * (rho / R)).astype(int)
+
+    inside = (cx >= 0) & (cx < width) & (cy >= 0) & (cy < height)
+    return {'cx': cx[inside], 'cy': cy[inside], 'x': cx[inside].astype(int), 'y': cy[inside].astype(int),
+            'radius': radius[inside], 'R': ring[inside], 'S': sector[inside]}
+
+
+def rf_pixel_matrix(x, y, radius, width, height, weighted=False):
+    """
+    Sparse mapping from sensor pixels to the receptive fields that contain them.
+
+    Every RF is a disk of its radius around its centre. Disks are built once per distinct radius
+    and broadcast over all the RFs sharing it.
+
+    Args:
+        x, y (np.ndarray): Integer centres of the RFs.
+        radius (np.ndarray): Integer radius of the RFs.
+        width, height (int): Sensor resolution.
+        weighted (bool): Weight the pixels by the Gaussian profile of the RF (sigma = radius / 2)
+            instead of 1.
+
+    Returns:
+        matrix (scipy.sparse.csr_matrix): (height * width, num_RFs) matrix, row y * width + x holds
+            the RFs of pixel (x, y) in increasing ID order.
+    """
+    rows, cols, data = [], [], []
+    for r in np.unique(radius):
+        ids = np.flatnonzero(radius == r)
+        ri, rj = min(r, height), min(r, width)  # Larger disks are cropped by the sensor anyway
+        i, j = np.mgrid[-ri:ri + 1, -rj:rj + 1]
+        disk = i ** 2 + j ** 2 <= r ** 2  # Pixels inside the circle
+        i, j = i[disk], j[disk]
+        weight = np.exp(-(i ** 2 + j ** 2) / (2 * (r / 2.0) ** 2)) if weighted and r > 0 else np.ones(len(i))
+
+        px = x[ids, np.newaxis] + j
+        py = y[ids, np.newaxis] + i
+        valid = (px >= 0) & (px < width) & (py >= 0) & (py < height)
+        rows.append((py * width + px)[valid])
+        cols.append(np.broadcast_to(ids[:, np.newaxis], valid.shape)[valid])
+        data.append(np.broadcast_to(weight, valid.shape)[valid])
+
+    matrix = sp.csr_matrix((np.concatenate(data).astype(np.float32), (np.concatenate(rows), np.concatenate(cols))),
+                           shape=(height * width, len(x)))
+    matrix.sort_indices()
+    return matrix
+
+
+def pixel_rf_inputs(matrix, x, y, width):
+    """
+    Expand events into one input per (event, RF containing the event's pixel).
+
+    Args:
+        matrix (scipy.sparse.csr_matrix): Pixel to RF mapping from rf_pixel_matrix.
+        x, y (np.ndarray): Coordinates of the events.
+        width (int): Sensor width.
+
+    Returns:
+        neuron_ids (np.ndarray): RF of every input.
+        event_index (np.ndarray): Index of the event of every input.
+        weights (np.ndarray): Weight of the pixel in the RF of every input.
+    """
+    pixels = np.asarray(y, dtype=np.int64) * width + np.asarray(x, dtype=np.int64)
+    starts, counts = matrix.indptr[pixels], np.diff(matrix.indptr)[pixels]
+    event_index = np.repeat(np.arange(len(pixels)), counts)
+    offsets = np.arange(len(event_index)) - np.repeat(np.cumsum(counts) - counts, counts)
+    entries = np.repeat(starts, counts) + offsets
+    return matrix.indices[entries], event_index, matrix.data[entries]
+
+
+def project_events(matrix, x, y, width, values=None):
+    """Sum of the (optionally valued) events falling in every RF, as a single sparse matrix product."""
+    pixels = np.asarray(y, dtype=np.int64) * width + np.asarray(x, dtype=np.int64)
+    events = np.bincount(pixels, weights=values, minlength=matrix.shape[0])
+    return matrix.T @ events
+
+
+@lru_cache(maxsize=None)
+def gaussian_stamp(radius):
+    """
+    Gaussian profile of a RF of the given radius (sigma = radius / 2), computed once per radius.
+
+    Args:
+        radius (int): Radius of the RF.
+
+    Returns:
+        i, j (np.ndarray): Row and column offsets of the pixels inside the RF.
+        value (np.ndarray): Gaussian value of every pixel, 1 at the centre.
+    """
+    i, j = np.mgrid[-radius:radius + 1, -radius:radius + 1]
+    disk = i ** 2 + j ** 2 <= radius ** 2
+    i, j = i[disk], j[disk]
+    value = np.exp(-(i ** 2 + j ** 2) / (2 * (radius / 2.0) ** 2)) if radius > 0 else np.ones(1)
+    for array in (i, j, value):
+        array.setflags(write=False)  # Shared by every caller through the cache
+    return i, j, value
+
+
+def render_rfs(window, x, y, radius, ids, scale=255):
+    """
+    Draw the Gaussian profile of the RFs of a set of neurons, e.g. the ones that spiked in a time window.
+
+    All the neurons with the same radius are drawn at once from the cached stamp, overlapping RFs keep
+    the maximum value.
+
+    Args:
+        window (np.ndarray): Image to draw into, modified in place.
+        x, y, radius (np.ndarray): Integer centres and radius of all the RFs.
+        ids (array-like): IDs of the neurons to draw.
+        scale (float): Value of the RF centres.
+
+    Returns:
+        window (np.ndarray): The image.
+    """
+    ids = np.unique(np.asarray(ids, dtype=np.int64))
+    height, width = window.shape[:2]
+    for r in np.unique(radius[ids]):
+        drawn = ids[radius[ids] == r]
+        i, j, value = gaussian_stamp(int(r))
+        py = y[drawn, np.newaxis] + i
+        px = x[drawn, np.newaxis] + j
+        valid = (px >= 0) & (px < width) & (py >= 0) & (py < height)  # Clip the stamps to the image
+        np.maximum.at(window, (py[valid], px[valid]), np.broadcast_to(value * scale, valid.shape)[valid])
+    return window
+
+
+class LogPolarRetina:
+    """
+    Log-polar retina: geometry of the receptive fields (RFs) and sparse pixel to RF mapping.
+
+    Everything is stored as NumPy arrays, so a retina can be saved to and loaded from a single
+    uncompressed .npz file, or handed to other processes.
+
+    Args:
+        a, rho0, R, S, width, height: Log-polar parameters and sensor resolution, see eccentric_rf_geometry.
+        weighted (bool): Weight the pixel mapping by the Gaussian profile of the RFs.
+    """
+
+    GEOMETRY_FIELDS = ('cx', 'cy', 'x', 'y', 'radius', 'R', 'S')
+
+    def __init__(self, a, rho0, R, S, width, height, weighted=False, geometry=None, matrix=None):
+        self.params = {'a': float(a), 'rho0': float(rho0), 'R': int(R), 'S': int(S),
+                       'width': int(width), 'height': int(height), 'weighted': bool(weighted)}
+        if geometry is None:
+            geometry = eccentric_rf_geometry(a, rho0, R, S, width, height)
+        for field in self.GEOMETRY_FIELDS:
+            setattr(self, field, geometry[field])
+        if matrix is None:
+            matrix = rf_pixel_matrix(self.x, self.y, self.radius, width, height, weighted)
+        self.matrix = matrix
+
+    @property
+    def num_neurons(self):
+        return len(self.x)
+
+    @property
+    def width(self):
+        return self.params['width']
+
+    @property
+    def height(self):
+        return self.params['height']
+
+    def save(self, path):
+        arrays = {field: getattr(self, field) for field in self.GEOMETRY_FIELDS}
+        np.savez(path, params=json.dumps(self.params), indptr=self.matrix.indptr,
+                 indices=self.matrix.indices, data=self.matrix.data, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as f:
+            params = json.loads(str(f['params']))
+            geometry = {field: f[field] for field in cls.GEOMETRY_FIELDS}
+            matrix = sp.csr_matrix((f['data'], f['indices'], f['indptr']),
+                                   shape=(params['height'] * params['width'], len(geometry['x'])))
+        return cls(geometry=geometry, matrix=matrix, **params)
+
+    @classmethod
+    def cached(cls, a, rho0, R, S, width, height, weighted=False, cache_dir=None):
+        """Load the retina from cache_dir, where it is saved under a name derived from its parameters, or build it."""
+        if cache_dir is None:
+            return cls(a, rho0, R, S, width, height, weighted)
+        key = repr((float(a), float(rho0), int(R), int(S), int(width), int(height), bool(weighted))).encode()
+        path = os.path.join(cache_dir, 'retina_' + hashlib.sha1(key).hexdigest() + '.npz')
+        if os.path.exists(path):
+            return cls.load(path)
+        retina = cls(a, rho0, R, S, width, height, weighted)
+        # Write through a temporary file of this process, so that parallel processes never load a truncated file
+        os.makedirs(cache_dir, exist_ok=True)
+        with open('%s.%d.tmp' % (path, os.getpid()), 'wb') as f:
+            retina.save(f)
+        os.replace(f.name, path)
+        return retina
+
+    def inputs(self, x, y):
+        """Expand events into (neuron_ids, event_index, weights) inputs, see pixel_rf_inputs."""
+        return pixel_rf_inputs(self.matrix, x, y, self.width)
+
+    def project(self, x, y, values=None):
+        """Sum of the events falling in every RF, see project_events."""
+        return project_events(self.matrix, x, y, self.width, values)
+
+    def render(self, window, ids, scale=255):
+        """Draw the Gaussian profile of the RFs of the given neurons, see render_rfs."""
+        return render_rfs(window, self.x, self.y, self.radius, ids, scale)
+
+
+class FoveatedCompressor:
+    """
+    Streaming stage pooling DVS events through a log-polar retina.
+
+    The events falling in the RF of a neuron during a time bin of dt microseconds are collapsed into
+    one event per polarity, emitted when their (pixel weighted) number reaches threshold. Peripheral
+    RFs pool many pixels while foveal RFs are single pixels, so the event rate drops with the
+    foveation factor. Output events have x = sector and y = ring - 1, i.e. they live on an
+    (R, S) log-polar sensor and can be fed to the framing, attention or OMS stages. Pixels outside
+    every RF are dropped.
+
+    Events of the last, possibly incomplete, bin of a chunk are held back until the next chunk (or
+    flush), so the output does not depend on how the stream is chunked.
+
+    The centre of the retina is placed at the fixation point of the sensor. Moving it (fixate) shifts
+    the event coordinates instead of rebuilding the pixel mapping. A retina twice as large as the
+    sensor covers the whole sensor wherever the fixation point is, otherwise the events outside the
+    retina are dropped.
+
+    Args:
+        retina (LogPolarRetina): Retina geometry.
+        dt (int): Time bin, in microseconds.
+        threshold (float): Minimum pooled weight of an output event.
+        fixation (tuple): (x, y) sensor coordinates of the centre of the retina, the centre of the
+            retina itself if None.
+    """
+
+    def __init__(self, retina, dt, threshold=1.0, fixation=None):
+        self.retina = retina
+        self.dt = dt
+        self.threshold = threshold
+        self.events_in = 0
+        self.events_out = 0
+        self._pending = None
+        self._centre = (retina.width // 2, retina.height // 2)  # Centre of the log-polar mapping
+        self.fixation = self._centre if fixation is None else (int(fixation[0]), int(fixation[1]))
+
+        # Neuron ID at every (ring - 1, sector) of the log-polar grid, -1 for the RFs out of the retina
+        self._neuron_ids = np.full(self.resolution, -1, dtype=np.int64)
+        self._neuron_ids[retina.R - 1, retina.S] = np.arange(retina.num_neurons)
+        self._area = np.asarray(retina.matrix.sum(axis=0)).ravel()  # Summed pixel weights of every RF
+
+    def fixate(self, x, y):
+        """Move the centre of the retina to (x, y) in sensor coordinates, for the next chunks."""
+        self.fixation = (int(x), int(y))
+
+    @property
+    def offset(self):
+        # Shift from retina to sensor coordinates
+        return self.fixation[0] - self._centre[0], self.fixation[1] - self._centre[1]
+
+    @property
+    def resolution(self):
+        return self.retina.params['R'], self.retina.params['S']
+
+    @property
+    def compression_ratio(self):
+        return self.events_in / max(self.events_out, 1)
+
+    def __call__(self, events, flush=False):
+        """
+        Pool a chunk of events.
+
+        Args:
+            events (EventStream): Chunk of events, later than the previous chunks.
+            flush (bool): Also pool the events of the last bin instead of holding them back.
+
+        Returns:
+            pooled (EventStream): Log-polar events, sorted by time.
+            weights (np.ndarray): Pooled weight of every output event.
+        """
+        self.events_in += len(events)
+        if self._pending is not None and len(self._pending):
+            events = EventStream(*(np.concatenate((getattr(self._pending, field), getattr(events, field)))
+                                   for field in ('x', 'y', 'ts', 'pol')))
+        self._pending = None
+        if not flush and len(events):
+            cut = np.searchsorted(events.ts, (events.ts[-1] // self.dt) * self.dt)
+            self._pending = events[cut:]
+            events = events[:cut]
+
+        # Events in retina coordinates, the ones falling outside the retina are dropped
+        x = events.x.astype(np.int64) - self.offset[0]
+        y = events.y.astype(np.int64) - self.offset[1]
+        inside = np.flatnonzero((x >= 0) & (x < self.retina.width) & (y >= 0) & (y < self.retina.height))
+        neuron_ids, event_index, weights = self.retina.inputs(x[inside], y[inside])
+        event_index = inside[event_index]
+        ts = events.ts[event_index]
+        pol = events.pol[event_index] > 0
+        key = ((ts // self.dt) * self.retina.num_neurons + neuron_ids) * 2 + pol
+        key, inverse = np.unique(key, return_inverse=True)
+        weights = np.bincount(inverse, weights=weights, minlength=len(key))
+        out_ts = np.zeros(len(key), dtype=np.int64)
+        np.maximum.at(out_ts, inverse, ts)  # Time of the last event pooled into every output
+
+        keep = np.flatnonzero(weights >= self.threshold)
+        keep = keep[np.argsort(out_ts[keep], kind='stable')]
+        neuron_ids = (key[keep] // 2) % self.retina.num_neurons
+        self.events_out += len(keep)
+        pooled = EventStream(self.retina.S[neuron_ids], self.retina.R[neuron_ids] - 1, out_ts[keep], key[keep] % 2)
+        return pooled, weights[keep]
+
+    def flush(self):
+        """Pool the events held back from the last chunk."""
+        empty = np.zeros(0)
+        return self(EventStream(empty, empty, empty, empty), flush=True)
+
+    def density(self, pooled, weights):
+        """Pooled weights of log-polar events divided by the area (summed pixel weights) of their RF."""
+        return weights / self._area[self._neuron_ids[pooled.y, pooled.x]]
+
+    def to_sensor(self, pooled, resolution):
+        """
+        Place pooled events at the centre of their RF on the sensor, for stages working on sensor frames.
+
+        Args:
+            pooled (EventStream): Log-polar events from this compressor.
+            resolution (tuple): (height, width) of the sensor, events falling outside are dropped.
+
+        Returns:
+            events (EventStream): Events at the RF centres, with the current fixation.
+        """
+        neuron_ids = self._neuron_ids[pooled.y, pooled.x]
+        x = self.retina.x[neuron_ids] + self.offset[0]
+        y = self.retina.y[neuron_ids] + self.offset[1]
+        inside = (x >= 0) & (x < resolution[1]) & (y >= 0) & (y < resolution[0])
+        return EventStream(x[inside], y[inside], pooled.ts[inside], pooled.pol[inside])
+
+    def grid_to_sensor(self, row, col):
+        """Sensor (x, y) of the RF centre at (ring - 1, sector) of the log-polar grid, None where there is no RF."""
+        neuron = self._neuron_ids[row, col]
+        if neuron < 0:
+            return None
+        return int(self.retina.x[neuron]) + self.offset[0], int(self.retina.y[neuron]) + self.offset[1]
+
+
+def foveated_attention(events, device, ATTENTION_PARAMS, retina, window_period, dt=None, threshold=1.0,
+                       resolution=None):
+    """
+    Closed loop of attention and foveation over the time windows of a recording.
+
+    The events of every window are pooled by the log-polar retina and the attention runs on the
+    pooled events, on the (R, S) log-polar grid rather than on the sensor, so its cost depends on
+    the number of RFs instead of the sensor resolution. ATTENTION_PARAMS must therefore describe
+    kernels that fit the grid. Every RF enters the attention with its pooled weight divided by its
+    area, so that a dense cluster of events stands out from uniform noise even though both activate
+    their RFs. The RF at the saliency maximum becomes the fixation point of the retina for the next
+    window, windows without pooled events keep the current fixation.
+
+    Args:
+        events (EventStream): Recording to process.
+        device (torch.device): Device running the attention network.
+        ATTENTION_PARAMS (dict): Attention parameters for the (R, S) grid, as for initialise_attention.
+        retina (LogPolarRetina): Retina geometry, e.g. twice the sensor resolution to cover the
+            whole sensor from any fixation point.
+        window_period (int): Duration of a time window in microseconds.
+        dt (int): Pooling time bin in microseconds, the whole window if None.
+        threshold (float): Minimum pooled weight of a foveated event.
+        resolution (tuple): (height, width) of the sensor, the resolution of the events if None.
+
+    Yields:
+        foveated (EventStream): Pooled events of the window at the centres of their RFs on the sensor.
+        salmap (torch.Tensor): (R, S) saliency map on the device, overwritten at the next window.
+        fixation (tuple): (x, y) sensor coordinates of the fixation point for the next window.
+    """
+    height, width = resolution or events.resolution
+    compressor = FoveatedCompressor(retina, dt or window_period, threshold, fixation=(width // 2, height // 2))
+    session = AttentionSession(device, ATTENTION_PARAMS, compressor.resolution)
+
+    for chunk in events.time_chunks(window_period):
+        pooled, weights = compressor(chunk, flush=True)  # Pool the whole window with the current fixation
+        foveated = compressor.to_sensor(pooled, (height, width))
+        # Feed the event density of every RF rather than its mere activity, the densest RF at 255
+        density = compressor.density(pooled, weights)
+        if len(pooled):
+            cells = pooled.y.astype(np.int64) * compressor.resolution[1] + pooled.x
+            density *= 255 / np.bincount(cells, weights=density).max()
+        salmap, salmax_coords = session.step(pooled, density)  # Log-polar events: x = sector, y = ring - 1
+        fixation = compressor.grid_to_sensor(*salmax_coords) if len(pooled) else None
+        if fixation is not None:
+            compressor.fixate(min(max(fixation[0], 0), width - 1), min(max(fixation[1], 0), height - 1))
+        yield foveated, salmap, compressor.fixation